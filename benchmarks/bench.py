@@ -0,0 +1,294 @@
+#!/usr/bin/env python
+"""Offline microbenchmarks for python-otrs hot paths.
+
+Runs without an OTRS server, on synthetic responses. Reports operations per
+second and peak memory per case, and can compare against a stored baseline:
+
+    python benchmarks/bench.py                       # run all cases
+    python benchmarks/bench.py parse                 # cases matching 'parse'
+    python benchmarks/bench.py --save benchmarks/baseline.json
+    python benchmarks/bench.py --compare benchmarks/baseline.json
+
+With --compare, the exit status is 1 when a case got slower than the
+baseline by more than --threshold (default 20%). Baselines are only
+comparable on the same machine and Python version.
+
+Requires Python 3.4 or later (tracemalloc).
+"""
+import argparse
+import base64
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(
+    __file__))))
+
+from otrs import xmlparser  # noqa: E402
+from otrs.client import SOAP_CODEC  # noqa: E402
+from otrs.objects import autocast  # noqa: E402
+from otrs.objects import extract_tagname  # noqa: E402
+from otrs.rest import RESTCodec  # noqa: E402
+from otrs.ticket.objects import Article  # noqa: E402
+from otrs.ticket.objects import Ticket  # noqa: E402
+from otrs.ticket.operations import unpack_tickets  # noqa: E402
+from otrs.ticket.template import GenericTicketConnectorSOAP  # noqa: E402
+
+TICKET_FIELDS = (
+    '<Age>346654</Age><ArchiveFlag>n</ArchiveFlag><ChangeBy>2</ChangeBy>'
+    '<Changed>2014-05-16 11:24:19</Changed><CreateBy>1</CreateBy>'
+    '<CreateTimeUnix>1400234702</CreateTimeUnix>'
+    '<Created>2014-05-16 10:05:02</Created><CustomerID>9</CustomerID>'
+    '<CustomerUserID>foo@bar.tld</CustomerUserID>'
+    '<EscalationResponseTime>0</EscalationResponseTime>'
+    '<EscalationSolutionTime>0</EscalationSolutionTime>'
+    '<EscalationTime>0</EscalationTime>'
+    '<EscalationUpdateTime>0</EscalationUpdateTime><GroupID>1</GroupID>'
+    '<Lock>unlock</Lock><LockID>1</LockID><Owner>fbarman</Owner>'
+    '<OwnerID>2</OwnerID><Priority>3 normal</Priority>'
+    '<PriorityID>3</PriorityID><Queue>Support</Queue><QueueID>2</QueueID>'
+    '<RealTillTimeNotUsed>0</RealTillTimeNotUsed>'
+    '<Responsible>admin</Responsible><ResponsibleID>1</ResponsibleID>'
+    '<SLAID/><ServiceID/><State>closed unsuccessful</State>'
+    '<StateID>3</StateID><StateType>closed</StateType>'
+    '<TicketID>{ticket_id}</TicketID><TicketNumber>515422152827'
+    '</TicketNumber><Title>Foofoo my title</Title><Type>Divers</Type>'
+    '<TypeID>1</TypeID><UnlockTimeout>1400239459</UnlockTimeout>'
+    '<UntilTime>0</UntilTime>')
+
+ARTICLE = (
+    '<Article><ArticleID>{article_id}</ArticleID>'
+    '<ArticleType>email-external</ArticleType><ArticleTypeID>1'
+    '</ArticleTypeID><Body>{body}</Body><Charset>utf-8</Charset>'
+    '<ContentType>text/plain; charset=utf-8</ContentType>'
+    '<Created>2014-05-16 10:05:02</Created>'
+    '<From>John DOE &lt;john.doe@exemple.fr&gt;</From>'
+    '<MimeType>text/plain</MimeType><SenderType>customer</SenderType>'
+    '<Subject>Title</Subject><TicketID>{ticket_id}</TicketID>'
+    '{attachments}</Article>')
+
+ATTACHMENT = (
+    '<Attachment><Content>{content}</Content>'
+    '<ContentType>application/octet-stream</ContentType>'
+    '<Filename>{filename}</Filename><Filesize>{size}</Filesize>'
+    '</Attachment>')
+
+RESPONSE = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<soap:Envelope xmlns:soap="http://schemas.xmlsoap.org/soap/envelope/">'
+    '<soap:Body><TicketGetResponse xmlns="http://www.otrs.org/TicketConnector/"'
+    '>{tickets}</TicketGetResponse></soap:Body></soap:Envelope>')
+
+
+def ticket_xml(ticket_id=32, articles=0, attachments=0,
+               attachment_size=0, body_size=200):
+    """Return the XML of a Ticket element."""
+    content = base64.b64encode(os.urandom(attachment_size)).decode('ascii')
+    atts = ''.join(ATTACHMENT.format(content=content, size=attachment_size,
+                                     filename='log{0}.bin'.format(i))
+                   for i in range(attachments))
+    arts = ''.join(ARTICLE.format(article_id=i, ticket_id=ticket_id,
+                                  body='x' * body_size,
+                                  attachments=atts if i == 0 else '')
+                   for i in range(articles))
+    return '<Ticket>{0}{1}</Ticket>'.format(
+        TICKET_FIELDS.format(ticket_id=ticket_id), arts)
+
+
+def response(*tickets):
+    """Return a TicketGet response body."""
+    return RESPONSE.format(tickets=''.join(tickets)).encode('utf-8')
+
+
+def json_element(e):
+    """Return an element of a SOAP response as OTRS sends it in JSON."""
+    children = list(e)
+    if not children:
+        return e.text
+    d = {}
+    for c in children:
+        name = extract_tagname(c)
+        if name in ('Article', 'Attachment', 'DynamicField', 'Ticket'):
+            d.setdefault(name, []).append(json_element(c))
+        else:
+            d[name] = json_element(c)
+    return d
+
+
+def json_response(body):
+    """Return the REST (JSON) equivalent of a SOAP response body."""
+    e = list(list(xmlparser.fromstring(body))[0])[0]
+    return json.dumps(json_element(e)).encode('utf-8')
+
+
+SMALL = response(ticket_xml())
+HUGE = response(ticket_xml(articles=200, attachments=4,
+                           attachment_size=1024 * 1024))
+# the same 100 tickets with 3 articles each, as SOAP and as JSON
+BATCH = response(*[ticket_xml(ticket_id=i, articles=3)
+                   for i in range(100)])
+BATCH_JSON = json_response(BATCH)
+
+
+def parse(body, backend=None):
+    """Parse a TicketGet response into Ticket objects.
+
+    @param backend : the name of an otrs.xmlparser backend, defaults to the
+                     one in use
+    """
+    if backend is None:
+        e = xmlparser.fromstring(body)
+    else:
+        e = BACKENDS[backend].fromstring(body)
+    return [Ticket.from_xml(t) for t in list(list(list(e)[0])[0])]
+
+
+BACKENDS = dict((name, cls()) for name, cls in xmlparser.BACKENDS.items())
+
+
+def build_cases():
+    """Return a list of (name, callable) benchmark cases."""
+    ws = GenericTicketConnectorSOAP()
+    op = ws.TicketCreate
+    ticket = Ticket(State='new', Priority='3 normal', Queue='Postmaster',
+                    Title='Problem test', CustomerUser='foo@exemple.fr',
+                    Type='Unclassified')
+    article = Article(Subject='UnitTest', Body='bla ' * 500, Charset='UTF8',
+                      MimeType='text/plain')
+    request_kwargs = {'Ticket': ticket, 'Article': article,
+                      'SessionID': 'a' * 32}
+
+    def pack_req():
+        root = xmlparser.Element('TicketCreate')
+        root.append(ticket.to_xml())
+        root.append(article.to_xml())
+        op._pack_req(root)
+
+    small_ticket = parse(SMALL)[0]
+
+    def getattr_autocast():
+        t = small_ticket
+        (t.TicketID, t.QueueID, t.StateID, t.Queue, t.State, t.Priority,
+         t.Title, t.Created, t.Changed, t.TicketNumber)
+
+    def check_fields():
+        ticket.check_fields((('StateID', 'State'), ('PriorityID', 'Priority'),
+                             ('QueueID', 'Queue')))
+        article.check_fields(('Subject', 'Body', 'Charset', 'MimeType'))
+
+    rest = RESTCodec({})
+
+    def decode_soap():
+        SOAP_CODEC.unpack(unpack_tickets, SOAP_CODEC.parse(BATCH))
+
+    def decode_json():
+        rest.unpack(unpack_tickets, rest.parse(BATCH_JSON))
+
+    huge_article = parse(HUGE)[0].articles()[0]
+    folder = tempfile.mkdtemp()
+
+    def save_attachments():
+        huge_article.save_attachments(folder)
+
+    cases = [
+        ('pack_req', pack_req),
+        ('build_req', lambda: op._build_req('TicketCreate',
+                                            **request_kwargs)),
+        ('parse_small', lambda: parse(SMALL)),
+        ('parse_huge', lambda: parse(HUGE)),
+        ('decode_batch_soap', decode_soap),
+        ('decode_batch_json', decode_json),
+    ]
+    # the same responses with each available parser backend
+    for name in sorted(BACKENDS):
+        cases.extend([
+            ('parse_batch_' + name, lambda name=name: parse(BATCH, name)),
+            ('parse_huge_' + name, lambda name=name: parse(HUGE, name)),
+        ])
+    cases += [
+        ('autocast', lambda: (autocast('1400234702'), autocast('3 normal'),
+                              autocast('0.5'))),
+        ('getattr_autocast', getattr_autocast),
+        ('check_fields', check_fields),
+        ('save_attachments', save_attachments),
+    ]
+    return cases, lambda: shutil.rmtree(folder)
+
+
+def measure(func, min_time=0.5, repeat=3):
+    """Return (operations per second, peak memory in bytes) of func."""
+    timer = timeit.Timer(func)
+    number, elapsed = timer.autorange()
+    number = max(1, int(number * min_time / max(elapsed, 1e-9)))
+    best = min(timer.repeat(repeat=repeat, number=number)) / number
+
+    tracemalloc.start()
+    func()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return 1.0 / best, peak
+
+
+def main(argv=None):
+    """Run the benchmarks."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('filter', nargs='*',
+                        help='only run cases containing one of these')
+    parser.add_argument('--save', metavar='PATH',
+                        help='store the results as a baseline')
+    parser.add_argument('--compare', metavar='PATH',
+                        help='compare the results against a baseline')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='allowed slowdown against the baseline')
+    parser.add_argument('--min-time', type=float, default=0.5,
+                        help='seconds per timing run')
+    args = parser.parse_args(argv)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)['results']
+
+    cases, cleanup = build_cases()
+    results = {}
+    regressions = []
+    print('{0:<24} {1:>14} {2:>14} {3:>10}'.format(
+        'case', 'ops/sec', 'peak KiB', 'vs base'))
+    try:
+        for name, func in cases:
+            if args.filter and not any(f in name for f in args.filter):
+                continue
+            ops, peak = measure(func, min_time=args.min_time)
+            results[name] = {'ops_per_sec': ops, 'peak_bytes': peak}
+            change = ''
+            if name in baseline:
+                ratio = ops / baseline[name]['ops_per_sec']
+                change = '{0:+.1%}'.format(ratio - 1)
+                if ratio < 1 - args.threshold:
+                    regressions.append(name)
+                    change += ' !'
+            print('{0:<24} {1:>14,.1f} {2:>14,.1f} {3:>10}'.format(
+                name, ops, peak / 1024.0, change))
+    finally:
+        cleanup()
+
+    if args.save:
+        with open(args.save, 'w') as f:
+            json.dump({'python': platform.python_version(),
+                       'machine': platform.machine(),
+                       'xml_backend': xmlparser.get_backend().name,
+                       'results': results}, f, indent=2, sort_keys=True)
+            f.write('\n')
+    if regressions:
+        print('regressions: ' + ', '.join(regressions))
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
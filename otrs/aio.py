@@ -0,0 +1,562 @@
+"""OTRS :: aio.
+
+Asynchronous client, requires Python 3.5 or later.
+"""
+import asyncio
+from collections import deque
+import http.client as httplib
+import ssl
+from urllib.parse import urlsplit
+
+from otrs.client import BadStatusLineError
+from otrs.client import GenericInterfaceClient
+from otrs.client import OTRSError
+from otrs.client import SOAPError
+from otrs.client import StreamedBody
+from otrs.metrics import CallEvent
+from otrs.metrics import clock
+from otrs.objects import encode_value
+from otrs.transport import pool_stats
+from otrs.transport import PoolStats
+
+
+class AsyncResponse(object):
+    """Completely read HTTP response of an AsyncTransport."""
+
+    def __init__(self, status, headers, body):
+        """Initialize AsyncResponse."""
+        self.status = status
+        self.headers = headers
+        self.body = body
+        self.connect_time = 0.0     # seconds spent obtaining the connection
+
+    def getcode(self):
+        """Return the HTTP status code of the response."""
+        return self.status
+
+    def getheader(self, name, default=None):
+        """Return the value of a response header."""
+        return self.headers.get(name.lower(), default)
+
+    def read(self, amt=None):
+        """Return the response body."""
+        return self.body
+
+
+class AsyncConnectionPool(object):
+    """Bounded pool of persistent HTTP/1.1 streams to one endpoint."""
+
+    def __init__(self, scheme, host, port, maxsize=10, ssl_context=None):
+        """Initialize AsyncConnectionPool.
+
+        @param ssl_context : the ssl.SSLContext of all https connections
+        """
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.maxsize = maxsize
+        self.ssl_context = ssl_context
+        self.stats = PoolStats()
+        self._idle = []
+        self._semaphore = asyncio.Semaphore(maxsize)
+
+    @property
+    def endpoint(self):
+        """Return scheme://host:port of the pool."""
+        return '{0}://{1}:{2}'.format(self.scheme, self.host, self.port)
+
+    async def acquire(self, fresh=False):
+        """Return a connection from the pool.
+
+        @param fresh : never hand out an idle connection
+        @returns     : a ((reader, writer), reused) tuple
+        """
+        if self._semaphore.locked():
+            self.stats.waits += 1
+            loop = asyncio.get_event_loop()
+            started = loop.time()
+            await self._semaphore.acquire()
+            self.stats.wait_time += loop.time() - started
+        else:
+            await self._semaphore.acquire()
+
+        while self._idle and not fresh:
+            conn = self._idle.pop()
+            if conn[0].at_eof() or conn[1].is_closing():
+                # closed by the server while idle: replace it before use
+                conn[1].close()
+                self.stats.reconnects += 1
+                continue
+            self.stats.hits += 1
+            return conn, True
+        self.stats.new_connections += 1
+        if self.scheme == 'https':
+            ssl_arg = self.ssl_context or ssl.create_default_context()
+        else:
+            ssl_arg = None
+        try:
+            conn = await asyncio.open_connection(self.host, self.port,
+                                                 ssl=ssl_arg)
+        except BaseException:
+            self._semaphore.release()
+            raise
+        return conn, False
+
+    def release(self, conn, reusable=True):
+        """Give a connection back, closing it if it cannot be reused."""
+        if reusable and len(self._idle) < self.maxsize:
+            self._idle.append(conn)
+        else:
+            conn[1].close()
+        self._semaphore.release()
+
+    def close(self):
+        """Close all idle connections."""
+        while self._idle:
+            self._idle.pop()[1].close()
+
+
+class AsyncTransport(object):
+    """Non-blocking transport keeping persistent connections per endpoint."""
+
+    # raised when the request could not be written to a reused connection
+    SEND_ERRORS = (ConnectionError, OSError)
+    # raised when the server closed the connection without answering
+    NO_RESPONSE_ERRORS = (httplib.RemoteDisconnected, ConnectionResetError,
+                          BrokenPipeError)
+
+    def __init__(self, maxsize=10):
+        """Initialize AsyncTransport.
+
+        @param maxsize : maximum number of connections per endpoint
+        """
+        self.maxsize = maxsize
+        self._pools = {}
+
+    async def request(self, url, body, headers, timeout=None,
+                      ssl_context=None, method='POST', idempotent=True):
+        """POST body to url over a pooled connection.
+
+        A failing reused connection is replaced and the request sent again
+        as by PooledTransport.request(): only when it could not be written,
+        or for idempotent requests when the server closed the connection
+        without answering.
+
+        @returns an AsyncResponse
+        """
+        parts = urlsplit(url)
+        port = parts.port
+        if port is None:
+            port = 443 if parts.scheme == 'https' else 80
+        key = (parts.scheme, parts.hostname, port, ssl_context)
+        pool = self._pools.get(key)
+        if pool is None:
+            pool = self._pools[key] = AsyncConnectionPool(
+                parts.scheme, parts.hostname, port, maxsize=self.maxsize,
+                ssl_context=ssl_context)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        if body is None:
+            body = b''
+        head = ['{0} {1} HTTP/1.1'.format(method, path),
+                'Host: {0}'.format(parts.netloc)]
+        if 'Content-Length' not in headers:
+            head.append('Content-Length: {0}'.format(len(body)))
+        head.extend('{0}: {1}'.format(k, v) for k, v in headers.items())
+        message = (('\r\n'.join(head) + '\r\n\r\n').encode('latin-1'), body)
+
+        if isinstance(timeout, (int, float)):
+            return await asyncio.wait_for(
+                self._send(pool, message, idempotent), timeout)
+        return await self._send(pool, message, idempotent)
+
+    def _retryable(self, error, progress, idempotent):
+        """Return True if a request failing on a reused connection is to be
+        sent again, see PooledTransport._retryable().
+
+        @param progress : the phases of the request reached, see _roundtrip
+        """
+        if 'received' in progress or isinstance(error, TimeoutError):
+            return False
+        if 'sent' not in progress:
+            return isinstance(error, self.SEND_ERRORS)
+        return idempotent and isinstance(error, self.NO_RESPONSE_ERRORS)
+
+    async def _send(self, pool, message, idempotent=True):
+        started = clock()
+        conn, reused = await pool.acquire()
+        connect_time = clock() - started
+        progress = []
+        try:
+            response, keep_alive = await self._roundtrip(conn, message,
+                                                         progress)
+        except Exception as e:
+            pool.release(conn, reusable=False)
+            if not (reused and self._retryable(e, progress, idempotent)):
+                raise
+            pool.stats.reconnects += 1
+            started = clock()
+            conn, reused = await pool.acquire(fresh=True)
+            connect_time += clock() - started
+            try:
+                response, keep_alive = await self._roundtrip(conn, message)
+            except BaseException:
+                pool.release(conn, reusable=False)
+                raise
+        except BaseException:
+            pool.release(conn, reusable=False)
+            raise
+        pool.release(conn, reusable=keep_alive)
+        response.connect_time = connect_time
+        return response
+
+    @staticmethod
+    async def _roundtrip(conn, message, progress=None):
+        """Send a request and read the complete response.
+
+        @param progress : a list to which 'sent' is added once the request
+                          is written and 'received' once the response
+                          starts
+        @returns an (AsyncResponse, keep_alive) tuple
+        """
+        if progress is None:
+            progress = []
+        reader, writer = conn
+        head, body = message
+        writer.write(head)
+        for chunk in ((body, ) if isinstance(body, bytes) else body):
+            writer.write(chunk)
+            await writer.drain()
+        progress.append('sent')
+
+        status_line = await reader.readline()
+        if not status_line:
+            raise httplib.RemoteDisconnected(
+                'Remote end closed connection without response')
+        progress.append('received')
+        try:
+            version, status = status_line.decode('latin-1').split(None, 2)[:2]
+            status = int(status)
+        except ValueError:
+            raise httplib.BadStatusLine(status_line)
+
+        headers = {}
+        while True:
+            line = await reader.readline()
+            if line in (b'\r\n', b'\n'):
+                break
+            if not line:
+                raise asyncio.IncompleteReadError(b'', None)
+            name, _, value = line.decode('latin-1').partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        keep_alive = (version == 'HTTP/1.1' and
+                      headers.get('connection', '').lower() != 'close')
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            chunks = []
+            while True:
+                size = int(
+                    (await reader.readline()).split(b';')[0].strip(), 16)
+                if size == 0:
+                    while (await reader.readline()) not in (b'\r\n', b'\n',
+                                                            b''):
+                        pass
+                    break
+                chunks.append(await reader.readexactly(size))
+                await reader.readexactly(2)
+            body = b''.join(chunks)
+        elif 'content-length' in headers:
+            body = await reader.readexactly(int(headers['content-length']))
+        else:
+            body = await reader.read()
+            keep_alive = False
+        return AsyncResponse(status, headers, body), keep_alive
+
+    def stats(self):
+        """Return the pool statistics, per endpoint.
+
+        @returns a dict {'scheme://host:port': {counter: value}}
+        """
+        return pool_stats(self._pools.values())
+
+    async def close(self):
+        """Close all idle connections of all pools."""
+        for p in self._pools.values():
+            p.close()
+
+
+class AsyncSearchIterator(object):
+    """Asynchronous iterator of TicketSearch.iter()."""
+
+    def __init__(self, operation, paging, dynamic_fields, fetch):
+        """Initialize AsyncSearchIterator.
+
+        @param operation : the TicketSearch operation
+        @param paging    : the paging state of the search
+        @param fetch     : None or a callable returning an awaitable list of
+                           (TicketID, `Ticket`) tuples
+        """
+        self.operation = operation
+        self.paging = paging
+        self.dynamic_fields = dynamic_fields
+        self.fetch = fetch
+        self.pending = deque()
+        self.done = False
+
+    def __aiter__(self):
+        """Return the iterator itself."""
+        return self
+
+    async def __anext__(self):
+        """Return the next TicketID, or fetched tuple."""
+        while not self.pending:
+            if self.done:
+                raise StopAsyncIteration
+            await self._page()
+        return self.pending.popleft()
+
+    async def _page(self):
+        """Search the next page."""
+        paging = self.paging
+        ticket_ids = await self.operation(dynamic_fields=self.dynamic_fields,
+                                          **paging.params())
+        new = paging.new(ticket_ids)
+        if self.fetch is None:
+            self.pending.extend(new)
+            tickets = {}
+        else:
+            results = list(await self.fetch(new))
+            self.pending.extend(results)
+            tickets = dict(results)
+        if paging.complete(ticket_ids):
+            self.done = True
+            return
+
+        bound = paging.bound(ticket_ids, tickets)
+        if bound is None:
+            bound = await self._bound(ticket_ids)
+        paging.advance(ticket_ids, bound)
+
+    async def _bound(self, ticket_ids):
+        """Asynchronous variant of TicketSearch._bound()."""
+        ticket_get = self.operation.getWebServiceObjectAttribute('TicketGet')
+        for ticket_id in reversed(ticket_ids):
+            try:
+                ticket = await ticket_get(ticket_id)
+            except SOAPError as e:
+                error = e
+            else:
+                return encode_value(getattr(ticket, self.paging.bound_attr))
+        raise error
+
+
+class AsyncGenericInterfaceClient(GenericInterfaceClient):
+    """Asynchronous client for the OTRS Generic Interface.
+
+    Operations of the web services attached to this client return
+    awaitables, e.g. `ticket = await client.tc.TicketGet(1)`.
+    """
+
+    asynchronous = True
+
+    def __init__(self, server, ssl_context=None, timeout=None,
+                 transport=None, **kwargs):
+        """Initialize AsyncGenericInterfaceClient.
+
+        @param transport : an AsyncTransport, created if not given
+        """
+        if transport is None:
+            transport = AsyncTransport()
+        super(AsyncGenericInterfaceClient, self).__init__(
+            server, ssl_context=ssl_context, timeout=timeout,
+            transport=transport, **kwargs)
+        self._session_lock = None   # created on first use, in the event loop
+
+    async def _acall(self, operation, reqname, unpack, kwargs):
+        """Send a request for operation and unpack its response."""
+        policy = self.resilience
+        if policy is None:
+            return await self._acall_once(operation, reqname, unpack, kwargs)
+        breaker = policy.breaker(operation.endpoint)
+        attempt = 0
+        while True:
+            policy.before(breaker)
+            try:
+                result = await self._acall_once(
+                    operation, reqname, unpack, kwargs)
+            except Exception as e:
+                policy.record(breaker, e)
+                if not policy.should_retry(operation, e, attempt):
+                    raise
+            except BaseException:
+                # cancelled: the call has no outcome to record
+                breaker.release()
+                raise
+            else:
+                policy.record(breaker)
+                return result
+            await asyncio.sleep(policy.delay(attempt))
+            attempt += 1
+
+    async def _acall_once(self, operation, reqname, unpack, kwargs):
+        """Send a request once and unpack its response."""
+        event = CallEvent(reqname, operation.endpoint) if self.hooks else None
+        try:
+            t = clock()
+            method, path, body = operation._build_request(reqname, kwargs)
+            headers = operation.codec.HEADERS
+            if event is not None:
+                event.request_bytes = len(body or b'')
+            if self.compression is not None:
+                body, headers = self.compression.encode(body, headers)
+            if isinstance(body, StreamedBody):
+                headers = dict(headers)
+                headers['Content-Length'] = str(len(body))
+            if event is not None:
+                t, event.serialize = clock(), clock() - t
+            options = {'timeout': self.timeout,
+                       'ssl_context': self.ssl_context}
+            if method != 'POST':
+                options['method'] = method
+            if not operation.IDEMPOTENT:
+                options['idempotent'] = False
+            try:
+                fd = await self.transport.request(
+                    operation.endpoint + path, body, headers, **options)
+            except httplib.BadStatusLine:
+                raise BadStatusLineError(operation.endpoint)
+            if event is not None:
+                # the body has already been read with the headers
+                event.response_bytes = len(fd.body)
+                event.connect = fd.connect_time
+                t, event.server_wait = clock(), clock() - t - event.connect
+
+            if fd.getcode() != 200:
+                raise OTRSError(fd)
+            data = fd.read()
+            if self.compression is not None:
+                data = self.compression.decompress(fd, data)
+            offload = operation.parse_offload
+            if offload is not None and offload.accepts(data, unpack):
+                result = await self._aoffload(offload, data, unpack)
+                if event is not None:
+                    # parsed and unpacked at once by the worker
+                    event.parse = clock() - t
+                return result
+            e = operation._parse_resp(data)
+            if event is not None:
+                t, event.parse = clock(), clock() - t
+            result = operation.codec.unpack(unpack, e)
+            if event is not None:
+                event.construct = clock() - t
+            return result
+        except Exception as exc:
+            if event is not None:
+                event.error = type(exc).__name__
+            raise
+        finally:
+            if event is not None:
+                for hook in self.hooks:
+                    hook(event)
+
+    @staticmethod
+    async def _aoffload(offload, data, unpack):
+        """Parse and unpack a response body in a worker of offload."""
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+
+        def settle(method, value):
+            if not future.done():
+                method(value)
+
+        offload.submit(
+            data, unpack,
+            lambda r: loop.call_soon_threadsafe(
+                settle, future.set_result, r),
+            lambda e: loop.call_soon_threadsafe(
+                settle, future.set_exception, e))
+        return await future
+
+    async def _asession_call(self, manager, target, func, args, kwargs):
+        """Call an authenticated operation through a SessionManager."""
+        if self._session_lock is None:
+            self._session_lock = asyncio.Lock()
+        session = manager.current()
+        for attempt in range(2):
+            if attempt or session is None or manager.expiring(session):
+                async with self._session_lock:
+                    if manager.needs_renewal(session):
+                        manager.store(await manager.create(target))
+                    session = manager.current()
+            manager.touch()
+            kwargs['SessionID'] = session.session_id
+            try:
+                return await func(target, *args, **kwargs)
+            except SOAPError as e:
+                if attempt or not manager.is_expired_error(e):
+                    raise
+
+    @staticmethod
+    async def _amany(batches):
+        """Asynchronous variant of TicketGet.many().
+
+        @param batches : the awaitable TicketGet calls, one per batch
+        @returns       : the list of (TicketID, `Ticket`) tuples
+        """
+        results = await asyncio.gather(*batches)
+        return [(t.TicketID, t) for tickets in results for t in tickets]
+
+    @staticmethod
+    def _asearch_iter(operation, paging, dynamic_fields, fetch):
+        """Asynchronous variant of TicketSearch.iter().
+
+        @returns : an AsyncSearchIterator
+        """
+        return AsyncSearchIterator(operation, paging, dynamic_fields, fetch)
+
+    async def _acached(self, cache, key, load, cls):
+        """Asynchronous variant of ReferenceDataCache.fetch().
+
+        The records are refetched ahead of expiry by a task of the event
+        loop instead of a thread.
+
+        @param load : a callable returning an awaitable list of OTRSObjects
+        @param cls  : the OTRSObject class of the records
+        @returns    : a list of cls objects
+        """
+        entry = cache.entry(key)
+        if entry is None:
+            records = cache.store(key, [dict(i.attrs) for i in await load()])
+        else:
+            fetched_at, records = entry
+            if cache.due(fetched_at) and cache.start_refresh(key):
+                asyncio.ensure_future(self._arefresh(cache, key, load))
+        return [cls(**r) for r in records]
+
+    @staticmethod
+    async def _arefresh(cache, key, load):
+        """Refetch the records of key in the background, see _acached()."""
+        try:
+            cache.store(key, [dict(i.attrs) for i in await load()])
+            cache.last_error = None
+        except Exception as e:
+            cache.last_error = e
+        finally:
+            cache.end_refresh(key)
+
+    async def _aresult(self, value):
+        """Return value."""
+        return value
+
+    async def close(self):
+        """Close the connections of the transport."""
+        await self.transport.close()
+
+    async def __aenter__(self):
+        """Enter an `async with` block."""
+        return self
+
+    async def __aexit__(self, *exc_info):
+        """Close the client when leaving an `async with` block."""
+        await self.close()
@@ -0,0 +1,128 @@
+"""OTRS :: cache."""
+from collections import OrderedDict
+import threading
+import time
+
+# Fix Python 3.x.
+try:
+    UNICODE_EXISTS = bool(type(unicode))
+except NameError:
+    unicode = lambda s: str(s)
+
+
+def object_size(obj):
+    """Return the approximate size of an OTRSObject, in bytes.
+
+    Counts the characters of the attribute names and values of the object
+    and of its children.
+    """
+    size = 0
+    for k, v in obj._items():
+        size += len(k)
+        if v is not None:
+            size += getattr(v, 'size', None) or len(unicode(v))
+    for childs in obj.childs.values():
+        for child in childs:
+            size += object_size(child)
+    return size
+
+
+class LRUCache(object):
+    """Thread-safe mapping evicting least recently used entries.
+
+    Entries are evicted when there are more than maxsize of them, when their
+    total size exceeds maxbytes or when they are older than ttl seconds.
+    """
+
+    def __init__(self, maxsize=1024, maxbytes=None, ttl=None,
+                 sizeof=object_size):
+        """Initialize LRUCache.
+
+        @param maxsize  : maximum number of entries, None for no limit
+        @param maxbytes : maximum total size of the entries, None for no limit
+        @param ttl      : seconds an entry stays valid, None for no expiry
+        @param sizeof   : callable returning the size of a value
+        """
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.ttl = ttl
+        self.sizeof = sizeof
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.nbytes = 0
+        self._entries = OrderedDict()   # key -> (value, size, expires)
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        """Return the number of entries."""
+        return len(self._entries)
+
+    def get(self, key):
+        """Return the value for key, or None if absent or expired."""
+        with self._lock:
+            try:
+                value, size, expires = self._entries.pop(key)
+            except KeyError:
+                self.misses += 1
+                return None
+            if expires is not None and expires <= time.time():
+                self.nbytes -= size
+                self.evictions += 1
+                self.misses += 1
+                return None
+            self._entries[key] = (value, size, expires)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Store value for key and return it."""
+        entry = self._entry(value)
+        if entry is not None:
+            with self._lock:
+                self._store(key, value, *entry)
+        return value
+
+    def _entry(self, value):
+        """Return the (size, expires) of an entry, None if it is too large."""
+        size = self.sizeof(value) if self.maxbytes is not None else 0
+        if self.maxbytes is not None and size > self.maxbytes:
+            return None
+        expires = None if self.ttl is None else time.time() + self.ttl
+        return size, expires
+
+    def _store(self, key, value, size, expires):
+        """Store an entry and evict the least recently used, lock held."""
+        self._remove(key)
+        self._entries[key] = (value, size, expires)
+        self.nbytes += size
+        while ((self.maxsize is not None and
+                len(self._entries) > self.maxsize) or
+               (self.maxbytes is not None and
+                self.nbytes > self.maxbytes)):
+            evicted = self._entries.popitem(last=False)[1]
+            self.nbytes -= evicted[1]
+            self.evictions += 1
+
+    def pop(self, key):
+        """Remove the entry for key, if any."""
+        with self._lock:
+            self._remove(key)
+
+    def _remove(self, key):
+        """Remove the entry for key, if any, lock held."""
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.nbytes -= old[1]
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def stats(self):
+        """Return the cache counters as a dict."""
+        return {'hits': self.hits, 'misses': self.misses,
+                'evictions': self.evictions, 'entries': len(self._entries),
+                'bytes': self.nbytes}
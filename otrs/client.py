@@ -1,27 +1,30 @@
 """OTRS :: client."""
 import abc
 import codecs
+from collections import namedtuple
+import functools
 import socket
+import threading
 
-from defusedxml import ElementTree as etree
 try:
     import http.client as httplib
-    import urllib.request as urllib2
 except ImportError:
     import httplib
-    import urllib2
+from otrs.metrics import CallEvent
+from otrs.metrics import clock
+from otrs.metrics import CountingResponse
 from otrs.objects import extract_tagname
-from otrs.objects import OTRSObject
+from otrs.serializer import get_serializer
+from otrs.serializer import StreamedBody
+from otrs.transport import PooledTransport
+from otrs.transport import UrllibTransport
+from otrs.transport import uses_proxy
+from otrs import xmlparser
 from posixpath import join as urljoin
-import sys
-# defusedxml doesn't define these non-parsing related objects
-from xml.etree.ElementTree import Element
-from xml.etree.ElementTree import SubElement
-from xml.etree.ElementTree import tostring
 
-etree.Element = _ElementType = Element
-etree.SubElement = SubElement
-etree.tostring = tostring
+# formerly the defusedxml module, patched with the builders of
+# xml.etree.ElementTree; otrs.xmlparser provides the same functions
+etree = xmlparser
 
 # Fix Python 2.x.
 try:
@@ -60,8 +63,17 @@ class SOAPError(OTRSError):
     """OTRS Error originating from an incorrect SOAP request."""
 
     def __init__(self, tag):
-        """Initialize OTRS SOAPError."""
-        d = {extract_tagname(i): i.text for i in list(tag)}
+        """Initialize OTRS SOAPError.
+
+        @param tag : the Error etree.Element, or the Error dict of a JSON
+                     response
+        """
+        if isinstance(tag, dict):
+            d = tag
+        else:
+            d = {extract_tagname(i): i.text for i in list(tag)}
+        # pickled with the fields, e.g. by a ParseOffload worker
+        self.args = (d, )
         self.errcode = d['ErrorCode']
         self.errmsg = d['ErrorMessage']
 
@@ -97,14 +109,30 @@ class WrongOperatorException(OTRSError):
                '''
 
 
+# request parameters added by the authenticated decorator
+AUTH_PARAMS = ('SessionID', 'UserLogin', 'Password')
+
+# identity of a client, replaced as a whole so threads never see half of it
+Credentials = namedtuple('Credentials', ('login', 'password', 'session_id'))
+
+
 def authenticated(func):
-    """Decorator to add authentication parameters to a request."""
+    """Decorator to add authentication parameters to a request.
+
+    With a session manager and registered credentials, the manager takes
+    care of the SessionID; otherwise the SessionID of the client is used,
+    or the credentials are sent along with the request.
+    """
     def add_auth(self, *args, **kwargs):
-        if self.session_id:
-            kwargs['SessionID'] = self.session_id
-        elif self.login and self.password:
-            kwargs['UserLogin'] = self.login
-            kwargs['Password'] = self.password
+        credentials = self.credentials
+        manager = self.session_manager
+        if manager is not None and credentials.login and credentials.password:
+            return manager.call(self, func, args, kwargs)
+        if credentials.session_id:
+            kwargs['SessionID'] = credentials.session_id
+        elif credentials.login and credentials.password:
+            kwargs['UserLogin'] = credentials.login
+            kwargs['Password'] = credentials.password
         else:
             raise NoCredentialsException()
 
@@ -113,11 +141,149 @@ def authenticated(func):
     return add_auth
 
 
+def parse_response(s):
+    """Parse a response body.
+
+    @param s : the response body, as bytes
+    @returns : the full etree.Element of the response
+    """
+    try:
+        e = xmlparser.fromstring(s)
+
+        unpacked = OperationBase._unpack_resp_several(e)
+        if (len(unpacked) > 0) and (unpacked[0].tag.endswith('Error')):
+            raise SOAPError(unpacked[0])
+        return e
+    except xmlparser.ParseError:
+        print('error parsing:')
+        print('-' * 80)
+        print(s)
+        print('-' * 80)
+        raise
+
+
+def json_unpack(json_func):
+    """Decorator attaching the unpack function of JSON responses.
+
+    Unpack functions receive the etree.Element of a SOAP response; json_func
+    receives the decoded JSON document of a REST response instead, and
+    returns the same result. For an unpack method, json_func is a function
+    of (self, document).
+    """
+    def attach(func):
+        func.json = json_func
+        return func
+
+    return attach
+
+
+def stream_unpack(element_func):
+    """Decorator attaching the unpack function of streamed responses.
+
+    element_func turns one result element of a SOAP response (e.g. a
+    Ticket) into one result; _call() then returns an iterator of the
+    results, built while the response is read, see req_iter(). The
+    decorated function still unpacks complete responses, when the codec
+    does not stream or the client has a ParseOffload.
+    """
+    def attach(func):
+        func.stream = element_func
+        return func
+
+    return attach
+
+
+def json_variant(unpack):
+    """Return the JSON variant of an unpack function, None if it has none."""
+    func = getattr(unpack, 'json', None)
+    if func is None:
+        return None
+    owner = getattr(unpack, '__self__', None)
+    if owner is not None:
+        return functools.partial(func, owner)
+    return func
+
+
+def unpack_then(unpack, func):
+    """Return an unpack function passing the result of unpack to func.
+
+    The JSON variant of unpack, if any, is chained the same way.
+    """
+    def then(ret):
+        return func(unpack(ret))
+
+    json_func = json_variant(unpack)
+    if json_func is not None:
+        then.json = lambda doc: func(json_func(doc))
+    return then
+
+
+def json_list(doc, key):
+    """Return the value of key in a JSON response as a list.
+
+    OTRS sends a single result as a value and several as a list.
+    """
+    value = doc.get(key)
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return value
+    return [value]
+
+
+class SOAPCodec(object):
+    """Wire format of the SOAP web services, the default one.
+
+    A codec builds the requests of the operations and decodes their
+    responses; see otrs.rest.RESTCodec for the JSON/REST format.
+    """
+
+    HEADERS = {'Content-Type': 'text/xml;charset=utf-8'}
+
+    # responses can be parsed by the workers of a ParseOffload
+    offloadable = True
+    # responses can be parsed while they are read, see req_iter()
+    streaming = True
+
+    def request(self, operation, reqname, kwargs):
+        """Serialize a request, see OperationBase.req().
+
+        @returns : a (method, path, body) tuple, the path relative to the
+                   endpoint and the body as bytes, or as a StreamedBody
+                   when attachments are uploaded from files
+        """
+        serializer = get_serializer(
+            operation.getWebServiceObjectAttribute('wsNamespace'))
+        return 'POST', '', serializer.serialize(reqname, kwargs)
+
+    @staticmethod
+    def parse(s):
+        """Parse a response body, see parse_response()."""
+        return parse_response(s)
+
+    @staticmethod
+    def unpack(unpack, doc):
+        """Return the result of unpack for a parsed response."""
+        return unpack(doc)
+
+    @staticmethod
+    def results(doc):
+        """Return the result elements of a parsed response, see req_iter()."""
+        return OperationBase._unpack_resp_several(doc)
+
+
+# shared by the web services without a codec of their own
+SOAP_CODEC = SOAPCodec()
+
+
 class OperationBase(object):
     """Base class for OTRS operations."""
 
     __metaclass__ = abc.ABCMeta
 
+    # True for read-only operations, which are safe to send again
+    IDEMPOTENT = False
+
     def __init__(self, opName=None):
         """Initialize OperationBase."""
         if opName is None:
@@ -148,6 +314,11 @@ class OperationBase(object):
         """Return endpoint of WebService object."""
         return self.getWebServiceObjectAttribute('endpoint')
 
+    @property
+    def credentials(self):
+        """Return credentials of the clientobject of the WebService object."""
+        return self.getClientObjectAttribute('credentials')
+
     @property
     def login(self):
         """Get login attribute of the clientobject of the WebService object."""
@@ -158,6 +329,11 @@ class OperationBase(object):
         """Return password attribute of the clientobject of the WebService."""
         return self.getClientObjectAttribute('password')
 
+    @property
+    def session_manager(self):
+        """Return session_manager of the clientobject of the WebService."""
+        return self.getClientObjectAttribute('session_manager')
+
     @property
     def ssl_context(self):
         """Return ssl_context of the clientobject of the WebService."""
@@ -188,6 +364,23 @@ class OperationBase(object):
         """Return timeout of the clientobject of the WebService object."""
         return self.getClientObjectAttribute('timeout')
 
+    @property
+    def transport(self):
+        """Return transport of the clientobject of the WebService object."""
+        return self.getClientObjectAttribute('transport')
+
+    @property
+    def codec(self):
+        """Return the codec of the WebService object."""
+        return self.getWebServiceObjectAttribute('codec')
+
+    @property
+    def parse_offload(self):
+        """Return the ParseOffload of the client, if the codec allows it."""
+        if not self.codec.offloadable:
+            return None
+        return self.getClientObjectAttribute('parse_offload')
+
     def req(self, reqname, *args, **kwargs):
         """Wrapper around a SOAP request.
 
@@ -204,58 +397,319 @@ class OperationBase(object):
          - list of simple types will be converted to multiple
            <name>value</name> elements (e.g. used for search filters)
         """
-        xml_req_root = etree.Element(reqname)
-
-        for k, v in kwargs.items():
-            if isinstance(v, OTRSObject):
-                e = v.to_xml()
-                xml_req_root.append(e)
-            elif isinstance(v, (list, tuple)):
-                for vv in v:
-                    if isinstance(vv, OTRSObject):
-                        e = vv.to_xml()
-                    else:
-                        e = etree.Element(k)
-                        e.text = unicode(vv)
-                    xml_req_root.append(e)
-            else:
-                e = etree.Element(k)
-                e.text = unicode(v)
-                xml_req_root.append(e)
+        return self._parse_resp(self._fetch_body(reqname, **kwargs))
 
-        request = urllib2.Request(
-            self.endpoint, self._pack_req(xml_req_root),
-            {'Content-Type': 'text/xml;charset=utf-8'})
+    def _fetch_body(self, reqname, **kwargs):
+        """Send a request and return the response body, see req().
 
-        try:
-            if ((sys.version_info[0] == 3 and sys.version_info < (3, 4, 3)) or
-                    (sys.version_info < (2, 7, 9))):
-                fd = urllib2.urlopen(request, timeout=self.timeout)
-            else:
-                try:
-                    fd = urllib2.urlopen(request, context=self.ssl_context, timeout=self.timeout)
-                except TypeError:
-                    fd = urllib2.urlopen(request, timeout=self.timeout)
-        except httplib.BadStatusLine:
-            raise BadStatusLineError(request.get_full_url())
+        @returns : the response body, as bytes
+        """
+        fd = self._send(*self._build_request(reqname, kwargs))
 
         if fd.getcode() != 200:
             raise OTRSError(fd)
         else:
-            try:
-                s = fd.read()
-                e = etree.fromstring(s)
-
-                unpacked = self._unpack_resp_several(e)
-                if (len(unpacked) > 0) and (unpacked[0].tag.endswith('Error')):
-                    raise SOAPError(unpacked[0])
-                return e
-            except etree.ParseError:
-                print('error parsing:')
-                print('-' * 80)
-                print(s)
-                print('-' * 80)
-                raise
+            return fd.read()
+
+    def req_iter(self, reqname, *args, **kwargs):
+        """Streaming variant of req().
+
+        The response is fed into an incremental parser while it is read
+        from the connection. Each top-level result element (e.g. a Ticket
+        or a TicketID) is yielded as soon as it is complete and cleared
+        once the consumer asks for the next one, so memory use is bounded
+        by the largest single result rather than by the whole response.
+
+        A codec that does not stream, i.e. REST, reads and parses the whole
+        response first, then its results are yielded, see results() of the
+        codec.
+
+        @param reqname: the SOAP name of the request
+        @param kwargs : to define the tags included in the request.
+        @returns      : a generator of etree.Element, or of the values of a
+                        JSON response
+        """
+        if not self.codec.streaming:
+            for result in self.codec.results(self.req(reqname, **kwargs)):
+                yield result
+            return
+        fd = self._send(*self._build_request(reqname, kwargs))
+
+        if fd.getcode() != 200:
+            raise OTRSError(fd)
+        for e in self._iter_response(fd):
+            yield e
+
+    @staticmethod
+    def _iter_response(fd):
+        """Yield the result elements of a response while it is read.
+
+        @param fd : the response object of the transport, closed once done
+        """
+        try:
+            # Envelope > Body > <reqname>Response > result elements
+            depth = 0
+            response = None
+            for event, e in xmlparser.iterparse(fd, events=('start', 'end')):
+                if event == 'start':
+                    depth += 1
+                    if depth == 3:
+                        response = e
+                    continue
+                depth -= 1
+                if depth != 3:
+                    continue
+                if e.tag.endswith('Error'):
+                    raise SOAPError(e)
+                yield e
+                e.clear()
+                response.remove(e)
+        finally:
+            fd.close()
+
+    def _send(self, method, path, body):
+        """Send a request to the endpoint.
+
+        @param method : the HTTP method
+        @param path   : the path of the request, relative to the endpoint
+        @param body   : the request body, as bytes or StreamedBody, or None
+        @returns      : the response object of the transport
+        """
+        headers = self.codec.HEADERS
+        compression = self.getClientObjectAttribute('compression')
+        if compression is not None:
+            body, headers = compression.encode(body, headers)
+        if isinstance(body, StreamedBody):
+            headers = dict(headers)
+            headers['Content-Length'] = str(len(body))
+        options = {'timeout': self.timeout, 'ssl_context': self.ssl_context}
+        if method != 'POST':
+            # transports written for SOAP only know POST
+            options['method'] = method
+        if not self.IDEMPOTENT:
+            options['idempotent'] = False
+        try:
+            fd = self.transport.request(self.endpoint + path, body, headers,
+                                        **options)
+        except httplib.BadStatusLine:
+            raise BadStatusLineError(self.endpoint)
+        if compression is not None:
+            return compression.decode(fd)
+        return fd
+
+    def _build_request(self, reqname, kwargs):
+        """Build a request with the codec, see req() for kwargs.
+
+        @param reqname: the SOAP name of the request
+        @returns      : a (method, path, body) tuple, see SOAPCodec.request()
+        """
+        return self.codec.request(self, reqname, kwargs)
+
+    def _build_req(self, reqname, **kwargs):
+        """Serialize a request, see req() for the keyword arguments.
+
+        @param reqname: the SOAP name of the request
+        @returns      : the request body, as bytes, or as a StreamedBody
+                        when attachments are uploaded from files
+        """
+        return self._build_request(reqname, kwargs)[2]
+
+    def _parse_resp(self, s):
+        """Parse a response body with the codec.
+
+        @param s : the response body, as bytes
+        @returns : the full etree.Element of the response, or the JSON
+                   document with a REST codec
+        """
+        return self.codec.parse(s)
+
+    def _unpack_data(self, data, unpack):
+        """Parse a response body and unpack it.
+
+        With a ParseOffload on the client, large bodies are parsed and
+        unpacked by one of its worker processes.
+
+        @param data   : the response body, as bytes
+        @param unpack : see _call()
+        @returns      : the result of unpack
+        """
+        offload = self.parse_offload
+        if offload is not None and offload.accepts(data, unpack):
+            return offload.run(data, unpack)
+        return self.codec.unpack(unpack, self._parse_resp(data))
+
+    def _call(self, reqname, unpack, **kwargs):
+        """Send a request and unpack its response.
+
+        @param reqname: the SOAP name of the request
+        @param unpack : a callable turning the response etree.Element into
+                        the result of the operation, with a JSON variant
+                        for REST web services, see json_unpack()
+        @returns      : the result of unpack, or an awaitable resolving to
+                        it when the client is asynchronous
+        """
+        if self.getClientObjectAttribute('asynchronous'):
+            return self.getClientObjectAttribute('_acall')(
+                self, reqname, unpack, kwargs)
+        hooks = self.getClientObjectAttribute('hooks')
+        policy = self.getClientObjectAttribute('resilience')
+        if policy is not None:
+            return policy.call(self, lambda: self._call_once(
+                hooks, reqname, unpack, kwargs))
+        return self._call_once(hooks, reqname, unpack, kwargs)
+
+    def _call_once(self, hooks, reqname, unpack, kwargs):
+        """Send a request once and unpack its response, see _call()."""
+        if self._streams(unpack):
+            if hooks:
+                return self._traced_stream(hooks, reqname, unpack.stream,
+                                           kwargs)
+            return self._stream(reqname, unpack.stream, kwargs)
+        if hooks:
+            return self._traced_call(hooks, reqname, unpack, kwargs)
+        if self.parse_offload is not None:
+            data = self._fetch_body(reqname, **kwargs)
+            return self._unpack_data(data, unpack)
+        return self.codec.unpack(unpack, self.req(reqname, **kwargs))
+
+    def _streams(self, unpack):
+        """Return True if the response of unpack is to be streamed."""
+        return (getattr(unpack, 'stream', None) is not None and
+                self.codec.streaming and self.parse_offload is None)
+
+    def _stream(self, reqname, element_func, kwargs):
+        """Send a request and return an iterator of its unpacked results.
+
+        The response is read up to its first result before returning, so
+        that a SOAPError (e.g. for an expired session) is raised by _call()
+        rather than by the iterator.
+
+        @param element_func : see stream_unpack()
+        """
+        elements = self.req_iter(reqname, **kwargs)
+        try:
+            first = next(elements)
+        except StopIteration:
+            return iter(())
+        return self._unpack_stream(first, elements, element_func)
+
+    @staticmethod
+    def _unpack_stream(first, elements, element_func):
+        """Yield element_func() of first and of the rest of elements."""
+        try:
+            yield element_func(first)
+            for e in elements:
+                yield element_func(e)
+        finally:
+            elements.close()
+
+    def _traced_stream(self, hooks, reqname, element_func, kwargs):
+        """Variant of _stream() timing each phase of the call.
+
+        The CallEvent is passed to each hook once the iteration is over or
+        failed; reading and parsing the response count as parse, the time
+        the consumer spends between two results is not counted.
+        """
+        event = CallEvent(reqname, self.endpoint)
+        try:
+            t = clock()
+            method, path, body = self._build_request(reqname, kwargs)
+            event.request_bytes = len(body or b'')
+            t, event.serialize = clock(), clock() - t
+
+            fd = self._send(method, path, body)
+            event.connect = getattr(fd, 'connect_time', 0.0)
+            t, event.server_wait = clock(), clock() - t - event.connect
+            if fd.getcode() != 200:
+                raise OTRSError(fd)
+            reader = CountingResponse(fd)
+            elements = self._iter_response(reader)
+            first = next(elements, None)
+            event.parse = clock() - t
+        except Exception as exc:
+            event.error = type(exc).__name__
+            for hook in hooks:
+                hook(event)
+            raise
+        if first is None:
+            event.response_bytes = reader.count
+            for hook in hooks:
+                hook(event)
+            return iter(())
+        return self._traced_results(hooks, event, reader, first, elements,
+                                    element_func)
+
+    @staticmethod
+    def _traced_results(hooks, event, reader, first, elements,
+                        element_func):
+        """Yield the results of _traced_stream() and report its event."""
+        try:
+            e = first
+            while e is not None:
+                t = clock()
+                result = element_func(e)
+                event.construct += clock() - t
+                yield result
+                t = clock()
+                e = next(elements, None)
+                event.parse += clock() - t
+        except Exception as exc:
+            event.error = type(exc).__name__
+            raise
+        finally:
+            elements.close()
+            event.response_bytes = reader.count
+            for hook in hooks:
+                hook(event)
+
+    def _traced_call(self, hooks, reqname, unpack, kwargs):
+        """Variant of _call() timing each phase of the call.
+
+        A CallEvent is passed to each hook once the call has completed or
+        failed.
+        """
+        event = CallEvent(reqname, self.endpoint)
+        try:
+            t = clock()
+            method, path, body = self._build_request(reqname, kwargs)
+            event.request_bytes = len(body or b'')
+            t, event.serialize = clock(), clock() - t
+
+            fd = self._send(method, path, body)
+            # the pooled transport reports the time spent in the pool
+            event.connect = getattr(fd, 'connect_time', 0.0)
+            t, event.server_wait = clock(), clock() - t - event.connect
+            if fd.getcode() != 200:
+                raise OTRSError(fd)
+            data = fd.read()
+            event.response_bytes = len(data)
+            t, event.read = clock(), clock() - t
+
+            offload = self.parse_offload
+            if offload is not None and offload.accepts(data, unpack):
+                result = offload.run(data, unpack)
+                # parsed and unpacked at once by the worker
+                event.parse = clock() - t
+                return result
+
+            e = self._parse_resp(data)
+            t, event.parse = clock(), clock() - t
+
+            result = self.codec.unpack(unpack, e)
+            event.construct = clock() - t
+            return result
+        except Exception as exc:
+            event.error = type(exc).__name__
+            raise
+        finally:
+            for hook in hooks:
+                hook(event)
+
+    def _result(self, value):
+        """Return value, as an awaitable when the client is asynchronous."""
+        if self.getClientObjectAttribute('asynchronous'):
+            return self.getClientObjectAttribute('_aresult')(value)
+        return value
 
     @staticmethod
     def _unpack_resp_several(element):
@@ -282,7 +736,8 @@ class OperationBase(object):
         @returns       : a string, wrapping element within the request tags
         """
         return self.soap_envelope.format(
-            codecs.decode(etree.tostring(element), 'utf-8')).encode('utf-8')
+            codecs.decode(xmlparser.tostring(element),
+                          'utf-8')).encode('utf-8')
 
 
 class WebService(object):
@@ -309,6 +764,12 @@ class WebService(object):
         if not hasattr(self, 'wsResponseNameScheme'):
             ns = '<FunctionNameResponse>DATA</FunctionNameResponse>'
             self.wsResponseNameScheme = ns
+        if not hasattr(self, 'cache'):
+            self.cache = None
+        if not hasattr(self, 'reference_cache'):
+            self.reference_cache = None
+        if not hasattr(self, 'codec'):
+            self.codec = SOAP_CODEC
 
     def getClientObjectAttribute(self, attribName):
         """Return attribute of the clientobject of the WebService object."""
@@ -327,11 +788,27 @@ class WebService(object):
 class GenericInterfaceClient(object):
     """Client for the OTRS Generic Interface."""
 
-    def __init__(self, server, ssl_context=None, timeout=None, **kwargs):
+    # operations return awaitables instead of results when True
+    asynchronous = False
+
+    def __init__(self, server, ssl_context=None, timeout=None,
+                 transport=None, session_manager=None, resilience=None,
+                 parse_offload=None, compression=None, **kwargs):
         """Initialize GenericInterfaceClient.
 
-        @param server : the http(s) URL of the root installation of OTRS
+        @param server    : the http(s) URL of the root installation of OTRS
         (e.g: https://tickets.example.net)
+        @param transport : an otrs.transport.Transport, defaults to a
+        PooledTransport keeping persistent connections to the server, or to
+        an UrllibTransport when the environment sets a proxy for it
+        @param session_manager : an otrs.session.manager.SessionManager, to
+        authenticate with sessions created from the registered credentials
+        @param resilience : an otrs.resilience.ResiliencePolicy, to retry
+        idempotent operations and fail fast while the server is down
+        @param parse_offload : an otrs.offload.ParseOffload, to parse large
+        responses in worker processes
+        @param compression : an otrs.compression.Compression, to exchange
+        gzip compressed requests and responses with the server
         """
         # add all variables in kwargs into the local dictionary
         self.__dict__.update(kwargs)
@@ -343,9 +820,14 @@ class GenericInterfaceClient(object):
             # set backlink for web services to this obj
             if isinstance(getattr(self, arg), WebService):
                 getattr(self, arg).clientObject = self
-        self.login = None
-        self.password = None
-        self.session_id = None
+        self.credentials = Credentials(None, None, None)
+        # serializes the read-modify-write of credentials
+        self._credentials_lock = threading.Lock()
+        self.session_manager = session_manager
+        self.resilience = resilience
+        self.parse_offload = parse_offload
+        self.compression = compression
+        self.hooks = []
         self.ssl_context = ssl_context
         self.giurl = urljoin(
             server, 'otrs/nph-genericinterface.pl/Webservice/')
@@ -355,13 +837,73 @@ class GenericInterfaceClient(object):
         else:
             self.timeout = timeout
 
+        if transport is None:
+            # the pooled transport connects to the server directly
+            if uses_proxy(server):
+                self.transport = UrllibTransport()
+            else:
+                self.transport = PooledTransport()
+        else:
+            self.transport = transport
+
+    @property
+    def login(self):
+        """Return the login of the registered credentials."""
+        return self.credentials.login
+
+    @login.setter
+    def login(self, login):
+        """Set the login of the registered credentials."""
+        self._replace_credentials(login=login)
+
+    @property
+    def password(self):
+        """Return the password of the registered credentials."""
+        return self.credentials.password
+
+    @password.setter
+    def password(self, password):
+        """Set the password of the registered credentials."""
+        self._replace_credentials(password=password)
+
+    @property
+    def session_id(self):
+        """Return the SessionID set by the last SessionCreate."""
+        return self.credentials.session_id
+
+    @session_id.setter
+    def session_id(self, session_id):
+        """Set the SessionID used by operations requiring authentication."""
+        self._replace_credentials(session_id=session_id)
+
     def register_credentials(self, login, password):
         """Save the identifiers in memory.
 
         They will be used with each subsequent request requiring authentication
         """
-        self.login = login
-        self.password = password
+        self._replace_credentials(login=login, password=password)
+
+    def _replace_credentials(self, **fields):
+        """Replace fields of the credentials, atomically.
+
+        Concurrent updates, such as a SessionCreate renewing the session
+        while another thread registers credentials, do not undo each other.
+        """
+        with self._credentials_lock:
+            self.credentials = self.credentials._replace(**fields)
+
+    def add_hook(self, hook):
+        """Register a callable receiving an otrs.metrics.CallEvent per call.
+
+        Hooks run in the calling thread after each operation call, also
+        when it failed, and should return quickly without raising. Without
+        hooks, calls are not timed at all.
+        """
+        self.hooks.append(hook)
+
+    def remove_hook(self, hook):
+        """Unregister a hook registered with add_hook()."""
+        self.hooks.remove(hook)
 
 
 class OldGTCClass(GenericInterfaceClient):
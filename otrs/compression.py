@@ -0,0 +1,186 @@
+"""OTRS :: compression."""
+import gzip
+import io
+import threading
+import zlib
+
+from otrs.serializer import StreamedBody
+
+# wbits of zlib for the gzip format
+GZIP_WBITS = 16 + zlib.MAX_WBITS
+
+
+def gzip_compress(data, level=6):
+    """Return data compressed in the gzip format."""
+    buf = io.BytesIO()
+    with gzip.GzipFile(fileobj=buf, mode='wb', compresslevel=level,
+                       mtime=0) as f:
+        f.write(data)
+    return buf.getvalue()
+
+
+class GzipResponse(object):
+    """Response decompressing a gzip encoded body while it is read.
+
+    Reads are bounded: at most amt bytes are decompressed per read(amt), so
+    a streaming parser never holds more than a chunk of the body.
+    """
+
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, response, compression):
+        """Initialize GzipResponse.
+
+        @param response    : the response of the transport
+        @param compression : the Compression counting the bytes
+        """
+        self._response = response
+        self._compression = compression
+        self._decoder = zlib.decompressobj(GZIP_WBITS)
+        self._buffer = b''
+        self._eof = False
+        self.wire_bytes = 0         # compressed bytes read
+        self.body_bytes = 0         # decompressed bytes returned
+        self.connect_time = getattr(response, 'connect_time', 0.0)
+
+    def getcode(self):
+        """Return the HTTP status code of the response."""
+        return self._response.getcode()
+
+    def getheader(self, name, default=None):
+        """Return the value of a response header."""
+        return self._response.getheader(name, default)
+
+    def _fill(self, amt):
+        while len(self._buffer) < amt and not self._eof:
+            data = self._decoder.unconsumed_tail
+            if not data:
+                data = self._response.read(self.CHUNK_SIZE)
+                self.wire_bytes += len(data)
+                if not data:
+                    self._buffer += self._decoder.flush()
+                    self._eof = True
+                    self._compression.count_response(self.wire_bytes,
+                                                     self.body_bytes +
+                                                     len(self._buffer))
+                    break
+            self._buffer += self._decoder.decompress(
+                data, amt - len(self._buffer))
+
+    def read(self, amt=None):
+        """Read (part of) the decompressed response body."""
+        if amt is None or amt < 0:
+            chunks = []
+            while True:
+                chunk = self.read(self.CHUNK_SIZE)
+                if not chunk:
+                    return b''.join(chunks)
+                chunks.append(chunk)
+        self._fill(amt)
+        data, self._buffer = self._buffer[:amt], self._buffer[amt:]
+        self.body_bytes += len(data)
+        return data
+
+    def close(self):
+        """Close the response."""
+        self._response.close()
+
+
+class Compression(object):
+    """gzip compression of the requests and responses of a client.
+
+    Responses: the client sends Accept-Encoding: gzip and decompresses gzip
+    encoded responses while they are read. Apache compresses the responses
+    of OTRS with mod_deflate.
+
+    Requests: bodies of at least threshold bytes, typically TicketCreate or
+    TicketUpdate with articles and attachments, are sent gzip compressed,
+    with Content-Encoding: gzip. The server has to decompress them, e.g.
+    with SetInputFilter DEFLATE of mod_deflate, so this is disabled unless
+    compress_requests is set. Attachments streamed from files are sent as
+    they are.
+    """
+
+    def __init__(self, accept_gzip=True, compress_requests=False,
+                 threshold=16 * 1024, level=6):
+        """Initialize Compression.
+
+        @param accept_gzip       : ask for gzip compressed responses
+        @param compress_requests : compress large request bodies
+        @param threshold         : the size, in bytes, from which a request
+                                   body is compressed
+        @param level             : the gzip compression level, 1 to 9
+        """
+        self.accept_gzip = accept_gzip
+        self.compress_requests = compress_requests
+        self.threshold = threshold
+        self.level = level
+        self.request_bytes = 0          # bytes of the compressed requests
+        self.request_wire_bytes = 0     # bytes sent for them
+        self.response_bytes = 0         # bytes of the compressed responses
+        self.response_wire_bytes = 0    # bytes received for them
+        self._lock = threading.Lock()
+
+    def encode(self, body, headers):
+        """Return the body and headers of a request to send.
+
+        @param body    : the request body, as bytes or StreamedBody, or None
+        @param headers : the request headers, a dict left unchanged
+        @returns       : a (body, headers) tuple
+        """
+        headers = dict(headers)
+        if self.accept_gzip:
+            headers['Accept-Encoding'] = 'gzip'
+        if (self.compress_requests and body is not None and
+                not isinstance(body, StreamedBody) and
+                len(body) >= self.threshold):
+            compressed = gzip_compress(body, self.level)
+            with self._lock:
+                self.request_bytes += len(body)
+                self.request_wire_bytes += len(compressed)
+            body = compressed
+            headers['Content-Encoding'] = 'gzip'
+        return body, headers
+
+    @staticmethod
+    def is_gzip(response):
+        """Return True if the body of a response is gzip encoded."""
+        getheader = getattr(response, 'getheader', None)
+        return (getheader is not None and
+                (getheader('Content-Encoding') or '').lower() == 'gzip')
+
+    def decode(self, response):
+        """Return the response, decompressing its body if gzip encoded."""
+        if not self.is_gzip(response):
+            return response
+        return GzipResponse(response, self)
+
+    def decompress(self, response, data):
+        """Return the completely read body of a response, decompressed."""
+        if not self.is_gzip(response):
+            return data
+        body = zlib.decompress(data, GZIP_WBITS)
+        self.count_response(len(data), len(body))
+        return body
+
+    def count_response(self, wire_bytes, body_bytes):
+        """Record the sizes of a compressed response."""
+        with self._lock:
+            self.response_wire_bytes += wire_bytes
+            self.response_bytes += body_bytes
+
+    def stats(self):
+        """Return the byte counters and the bytes saved by compression.
+
+        @returns a dict {'requests': {...}, 'responses': {...}}
+        """
+        with self._lock:
+            return {
+                'requests': {
+                    'bytes': self.request_bytes,
+                    'wire_bytes': self.request_wire_bytes,
+                    'saved': self.request_bytes - self.request_wire_bytes},
+                'responses': {
+                    'bytes': self.response_bytes,
+                    'wire_bytes': self.response_wire_bytes,
+                    'saved': self.response_bytes - self.response_wire_bytes}}
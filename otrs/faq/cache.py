@@ -0,0 +1,143 @@
+"""OTRS :: faq :: cache."""
+import json
+import os
+import tempfile
+import threading
+import time
+
+
+class ReferenceDataCache(object):
+    """Cache for rarely changing lists, e.g. FAQ languages and categories.
+
+    Once a list has been fetched, callers are always answered from the
+    cache. When an entry is older than refresh_ahead * ttl, it is refetched
+    in a background thread while the current data is still returned, also
+    when it is older than ttl because the refetch failed.
+
+    With a path, entries are persisted as JSON so a new process starts
+    with the data of the previous one. Asynchronous clients refetch in a
+    task of their event loop rather than in a thread.
+    """
+
+    def __init__(self, ttl=24 * 3600, refresh_ahead=0.75, path=None):
+        """Initialize ReferenceDataCache.
+
+        @param ttl           : seconds the data is considered fresh
+        @param refresh_ahead : fraction of ttl after which data is refetched
+        @param path          : optional JSON file to persist entries in
+        """
+        self.ttl = ttl
+        self.refresh_ahead = refresh_ahead
+        self.path = path
+        self.last_error = None      # exception of the last failed refetch
+        self._entries = {}          # key -> (fetched_at, records)
+        self._refreshing = {}       # key -> refetching thread
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        if path is not None and os.path.exists(path):
+            with open(path) as f:
+                self._entries = dict((k, tuple(v))
+                                     for k, v in json.load(f).items())
+
+    def fetch(self, key, loader):
+        """Return the records for key.
+
+        @param key    : a str identifying the request
+        @param loader : a callable returning the records, a list of dicts
+                        of simple types; only called synchronously when
+                        there is no entry for key yet
+        @returns      : the records
+        """
+        entry = self.entry(key)
+        if entry is None:
+            return self._load(key, loader)
+        fetched_at, records = entry
+        if self.due(fetched_at):
+            self._refresh(key, loader)
+        return records
+
+    def entry(self, key):
+        """Return the (fetched_at, records) entry of key, or None."""
+        with self._lock:
+            return self._entries.get(key)
+
+    def due(self, fetched_at):
+        """Return True if records fetched at fetched_at are to be refetched."""
+        return time.time() - fetched_at >= self.ttl * self.refresh_ahead
+
+    def store(self, key, records):
+        """Store the records fetched for key and return them."""
+        with self._lock:
+            self._entries[key] = (time.time(), records)
+        if self.path is not None:
+            self._save()
+        return records
+
+    def start_refresh(self, key, handle=None):
+        """Record a refetch of key; return False if one is already running.
+
+        @param handle : the thread refetching, waited for by wait()
+        """
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing[key] = handle
+            return True
+
+    def end_refresh(self, key):
+        """Record the end of the refetch of key, see start_refresh()."""
+        with self._lock:
+            self._refreshing.pop(key, None)
+
+    def _load(self, key, loader):
+        return self.store(key, loader())
+
+    def _refresh(self, key, loader):
+        def run():
+            try:
+                self._load(key, loader)
+                self.last_error = None
+            except Exception as e:
+                self.last_error = e
+            finally:
+                self.end_refresh(key)
+
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        if self.start_refresh(key, thread):
+            thread.start()
+
+    def wait(self):
+        """Wait for the running background refetches to finish."""
+        with self._lock:
+            threads = [t for t in self._refreshing.values()
+                       if t is not None]
+        for thread in threads:
+            thread.join()
+
+    def _save(self):
+        """Write the entries to path, atomically.
+
+        The entries are copied under the lock and written without it;
+        writes are serialized, each with a copy taken once the previous
+        one is done, so the file ends up with the latest entries.
+        """
+        with self._save_lock:
+            with self._lock:
+                entries = dict(self._entries)
+            folder = os.path.dirname(os.path.abspath(self.path))
+            fd, tmp_path = tempfile.mkstemp(suffix='.tmp', dir=folder)
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(entries, f)
+                getattr(os, 'replace', os.rename)(tmp_path, self.path)
+            except BaseException:
+                os.remove(tmp_path)
+                raise
+
+    def clear(self):
+        """Remove all entries."""
+        with self._lock:
+            self._entries.clear()
+        if self.path is not None:
+            self._save()
@@ -2,6 +2,7 @@
 from otrs.objects import Attachment
 from otrs.objects import AttachmentContainer
 from otrs.objects import OTRSObject
+from otrs.objects import schema
 
 
 class Category(OTRSObject):
@@ -21,3 +22,20 @@ class FAQItem(OTRSObject, AttachmentContainer):
 
     XML_NAME = 'FAQItem'
     CHILD_MAP = {'Attachment': Attachment}
+    FIELDS = (
+        'Approved', 'CategoryID', 'CategoryName', 'CategoryShortName',
+        'ContentType', 'Changed', 'ChangedBy', 'Created', 'CreatedBy',
+        'Field1', 'Field2', 'Field3', 'Field4', 'Field5', 'Field6', 'ID',
+        'ItemID', 'Keywords', 'Language', 'LanguageID', 'Name', 'Number',
+        'Result', 'State', 'StateID', 'StateTypeID', 'StateTypeName',
+        'Title', 'ValidID', 'VoteResult', 'Votes')
+    __slots__ = FIELDS
+    SCHEMA = schema(
+        int=('CategoryID', 'ChangedBy', 'CreatedBy', 'ID', 'ItemID',
+             'LanguageID', 'StateID', 'StateTypeID', 'ValidID', 'Votes'),
+        datetime=('Changed', 'Created'),
+        bool=('Approved', ),
+        str=('CategoryName', 'CategoryShortName', 'ContentType', 'Field1',
+             'Field2', 'Field3', 'Field4', 'Field5', 'Field6', 'Keywords',
+             'Language', 'Name', 'Number', 'Result', 'State',
+             'StateTypeName', 'Title'))
@@ -1,14 +1,69 @@
 """OTRS :: faq :: operations."""
+import json
+
+from otrs.client import AUTH_PARAMS
 from otrs.client import authenticated
+from otrs.client import json_list
+from otrs.client import json_unpack
 from otrs.client import OperationBase
 from otrs.faq.objects import Category as CategoryObject
 from otrs.faq.objects import FAQItem as FAQItemObject
 from otrs.faq.objects import Language as LanguageObject
+from otrs.offload import offloadable
+
+
+def unpack_languages_json(doc):
+    """Return the list of Languages of a JSON LanguageList response."""
+    return [LanguageObject.from_dict(d) for d in json_list(doc, 'Language')]
+
+
+def unpack_categories_json(doc):
+    """Return the list of Categories of a JSON response."""
+    return [CategoryObject.from_dict(d) for d in json_list(doc, 'Category')]
+
+
+@json_unpack(lambda doc: FAQItemObject.from_dict(json_list(doc,
+                                                           'FAQItem')[0]))
+@offloadable
+def unpack_faq_item(ret):
+    """Return the FAQItem of a PublicFAQGet response."""
+    return FAQItemObject.from_xml(OperationBase._unpack_resp_one(ret))
 
 
 class FAQ(OperationBase):
     """Base class for OTRS FAQ:: operations."""
 
+    IDEMPOTENT = True      # FAQ operations only read
+
+    def _reference_list(self, reqname, cls, unpack, **kwargs):
+        """Return a list of cls objects, through the reference cache if set.
+
+        @param reqname: the SOAP name of the request
+        @param cls    : the OTRSObject class of the list items
+        @param unpack : a callable turning the response into the list
+        """
+        cache = self.getWebServiceObjectAttribute('reference_cache')
+        if cache is None:
+            return self._call(reqname, unpack, **kwargs)
+
+        params = dict((k, v) for k, v in kwargs.items()
+                      if k not in AUTH_PARAMS)
+        key = json.dumps([reqname, sorted(params.items())])
+
+        def load():
+            return self._fetch(reqname, unpack, **params)
+
+        if self.getClientObjectAttribute('asynchronous'):
+            return self.getClientObjectAttribute('_acached')(
+                cache, key, load, cls)
+        records = cache.fetch(key, lambda: [dict(i.attrs) for i in load()])
+        return [cls(**r) for r in records]
+
+    @authenticated
+    def _fetch(self, reqname, unpack, **kwargs):
+        """Send a request with the current credentials and unpack it."""
+        return self._call(reqname, unpack, **kwargs)
+
 
 class LanguageList(FAQ):
     """Class to handle OTRS ITSM FAQ::LanguageList operation."""
@@ -19,7 +74,12 @@ class LanguageList(FAQ):
 
         @returns list of languages
         """
-        ret = self.req('LanguageList', **kwargs)
+        return self._reference_list('LanguageList', LanguageObject,
+                                    self._unpack_languages, **kwargs)
+
+    @json_unpack(lambda self, doc: unpack_languages_json(doc))
+    def _unpack_languages(self, ret):
+        """Return the list of Languages of a response."""
         elements = self._unpack_resp_several(ret)
         return [LanguageObject.from_xml(language) for language in elements]
 
@@ -33,7 +93,12 @@ class PublicCategoryList(FAQ):
 
         @returns list of category objects
         """
-        ret = self.req('PublicCategoryList', **kwargs)
+        return self._reference_list('PublicCategoryList', CategoryObject,
+                                    self._unpack_categories, **kwargs)
+
+    @json_unpack(lambda self, doc: unpack_categories_json(doc))
+    def _unpack_categories(self, ret):
+        """Return the list of Categories of a response."""
         elements = self._unpack_resp_several(ret)
         return [CategoryObject.from_xml(category) for category in elements]
 
@@ -57,8 +122,7 @@ class PublicFAQGet(FAQ):
         else:
             params['GetAttachmentContents'] = 0
 
-        ret = self.req('PublicFAQGet', **params)
-        return FAQItemObject.from_xml(self._unpack_resp_one(ret))
+        return self._call('PublicFAQGet', unpack_faq_item, **params)
 
 
 class PublicFAQSearch(FAQ):
@@ -70,5 +134,10 @@ class PublicFAQSearch(FAQ):
 
         @returns a list of matching public FAQItem IDs
         """
-        ret = self.req('PublicFAQSearch', **kwargs)
+        return self._call('PublicFAQSearch', self._unpack_item_id_list,
+                          **kwargs)
+
+    @json_unpack(lambda self, doc: [int(i) for i in json_list(doc, 'ID')])
+    def _unpack_item_id_list(self, ret):
+        """Return the list of FAQItem IDs of a response."""
         return [int(i.text) for i in self._unpack_resp_several(ret)]
@@ -4,14 +4,47 @@ from otrs.faq.operations import LanguageList
 from otrs.faq.operations import PublicCategoryList
 from otrs.faq.operations import PublicFAQGet
 from otrs.faq.operations import PublicFAQSearch
+from otrs.rest import RESTCodec
 
 
-def GenericFAQConnectorSOAP(webservice_name='GenericFAQConnectorSOAP'):
+def GenericFAQConnectorSOAP(webservice_name='GenericFAQConnectorSOAP',
+                            reference_cache=None):
     """Return a GenericFAQConnectorSOAP Webservice object.
 
+    @param reference_cache : an optional otrs.faq.cache.ReferenceDataCache
+                             for LanguageList and PublicCategoryList
     @returns a WebService object with the GenericFAQConnectorSOAP operations
     """
     return WebService(webservice_name, 'http://www.otrs.org/FAQConnector',
+                      reference_cache=reference_cache,
+                      LanguageList=LanguageList(),
+                      PublicCategoryList=PublicCategoryList(),
+                      PublicFAQGet=PublicFAQGet(),
+                      PublicFAQSearch=PublicFAQSearch())
+
+
+# routes of the operations in GenericFAQConnectorREST.yml of OTRS
+FAQ_ROUTES = {
+    'LanguageList': ('GET', '/LanguageList'),
+    'PublicCategoryList': ('GET', '/PublicCategoryList'),
+    'PublicFAQGet': ('GET', '/PublicFAQGet/:ItemID'),
+    'PublicFAQSearch': ('POST', '/PublicFAQSearch'),
+}
+
+
+def GenericFAQConnectorREST(webservice_name='GenericFAQConnectorREST',
+                            reference_cache=None, routes=None):
+    """Return a GenericFAQConnectorREST Webservice object.
+
+    @param reference_cache : an optional otrs.faq.cache.ReferenceDataCache
+                             for LanguageList and PublicCategoryList
+    @param routes          : a dict {operation name: (HTTP method, route)}
+                             replacing routes of FAQ_ROUTES
+    @returns a WebService object with the GenericFAQConnectorREST operations
+    """
+    return WebService(webservice_name, 'http://www.otrs.org/FAQConnector',
+                      reference_cache=reference_cache,
+                      codec=RESTCodec(dict(FAQ_ROUTES, **(routes or {}))),
                       LanguageList=LanguageList(),
                       PublicCategoryList=PublicCategoryList(),
                       PublicFAQGet=PublicFAQGet(),
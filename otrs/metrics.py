@@ -0,0 +1,185 @@
+"""OTRS :: metrics."""
+import bisect
+import threading
+import time
+
+# time.perf_counter is not available on Python 2.x.
+clock = getattr(time, 'perf_counter', time.time)
+
+
+class CallEvent(object):
+    """Timings and sizes of one operation call, passed to the client hooks.
+
+    Timings are in seconds; a phase that was not reached because the call
+    failed earlier is 0.0.
+    """
+
+    __slots__ = ('operation', 'endpoint', 'serialize', 'connect',
+                 'server_wait', 'read', 'parse', 'construct',
+                 'request_bytes', 'response_bytes', 'error')
+
+    PHASES = ('serialize', 'connect', 'server_wait', 'read', 'parse',
+              'construct')
+
+    def __init__(self, operation, endpoint):
+        """Initialize CallEvent.
+
+        @param operation : the SOAP name of the request, e.g. 'TicketGet'
+        @param endpoint  : the URL of the web service
+        """
+        self.operation = operation
+        self.endpoint = endpoint
+        self.serialize = 0.0        # building the request body
+        self.connect = 0.0          # obtaining a connection from the pool
+        self.server_wait = 0.0      # sending the request until the headers
+        self.read = 0.0             # reading the response body
+        self.parse = 0.0            # parsing the response XML
+        self.construct = 0.0        # building the result objects
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.error = None           # class name of the raised exception
+
+    @property
+    def total(self):
+        """Return the total duration of the call."""
+        return sum(getattr(self, p) for p in self.PHASES)
+
+    def as_dict(self):
+        """Return the event as a dict."""
+        d = dict((k, getattr(self, k)) for k in self.__slots__)
+        d['total'] = self.total
+        return d
+
+    def __repr__(self):
+        """Return a representation of CallEvent."""
+        return '<CallEvent {0} {1:.6f}s error={2}>'.format(
+            self.operation, self.total, self.error)
+
+
+class CountingResponse(object):
+    """Response of a transport counting the body bytes read from it."""
+
+    def __init__(self, response):
+        """Initialize CountingResponse."""
+        self._response = response
+        self.count = 0
+
+    def read(self, amt=None):
+        """Read (part of) the response body."""
+        data = self._response.read(amt)
+        self.count += len(data)
+        return data
+
+    def close(self):
+        """Close the response."""
+        self._response.close()
+
+
+class Histogram(object):
+    """Latency histogram with fixed bucket upper bounds."""
+
+    # upper bounds in seconds, the last bucket is unbounded
+    BOUNDS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+              0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+    def __init__(self, bounds=BOUNDS):
+        """Initialize Histogram."""
+        self.bounds = tuple(bounds)
+        self.buckets = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def add(self, value):
+        """Record a value."""
+        self.buckets[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Return the upper bound of the bucket holding the q-quantile."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= rank:
+                return self.bounds[i] if i < len(self.bounds) else self.max
+        return self.max
+
+    def as_dict(self):
+        """Return the histogram as a dict."""
+        return {'count': self.count, 'sum': self.sum, 'max': self.max,
+                'mean': self.sum / self.count if self.count else 0.0,
+                'p50': self.quantile(0.5), 'p99': self.quantile(0.99),
+                'buckets': list(zip(self.bounds + (None,), self.buckets))}
+
+
+class OperationMetrics(object):
+    """Counters and latency histograms of one operation."""
+
+    def __init__(self):
+        """Initialize OperationMetrics."""
+        self.calls = 0
+        self.errors = {}            # exception class name -> count
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.latency = dict((p, Histogram())
+                            for p in CallEvent.PHASES + ('total',))
+
+    def add(self, event):
+        """Record a CallEvent."""
+        self.calls += 1
+        if event.error is not None:
+            self.errors[event.error] = self.errors.get(event.error, 0) + 1
+        self.request_bytes += event.request_bytes
+        self.response_bytes += event.response_bytes
+        for p in CallEvent.PHASES:
+            self.latency[p].add(getattr(event, p))
+        self.latency['total'].add(event.total)
+
+    def as_dict(self):
+        """Return the metrics as a dict."""
+        return {'calls': self.calls, 'errors': dict(self.errors),
+                'request_bytes': self.request_bytes,
+                'response_bytes': self.response_bytes,
+                'latency': dict((k, h.as_dict())
+                                for k, h in self.latency.items())}
+
+
+class MetricsAggregator(object):
+    """In-process hook aggregating CallEvents per operation.
+
+    Register it with GenericInterfaceClient.add_hook().
+    """
+
+    def __init__(self):
+        """Initialize MetricsAggregator."""
+        self._operations = {}       # operation name -> OperationMetrics
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        """Record a CallEvent."""
+        with self._lock:
+            metrics = self._operations.get(event.operation)
+            if metrics is None:
+                metrics = self._operations[event.operation] = \
+                    OperationMetrics()
+            metrics.add(event)
+
+    def snapshot(self):
+        """Return the metrics of all operations.
+
+        @returns a dict {operation name: metrics dict}
+        """
+        with self._lock:
+            return dict((k, m.as_dict())
+                        for k, m in self._operations.items())
+
+    def reset(self):
+        """Drop all recorded metrics."""
+        with self._lock:
+            self._operations.clear()
@@ -1,17 +1,25 @@
 """OTRS :: objects."""
 from __future__ import unicode_literals
 import base64
-from defusedxml import ElementTree as etree
+from datetime import datetime
+import io
+import mimetypes
 import os
 import sys
-# defusedxml doesn't define these non-parsing related objects
-from xml.etree.ElementTree import Element
-from xml.etree.ElementTree import SubElement
-from xml.etree.ElementTree import tostring
+import tempfile
+import threading
+import uuid
+try:
+    from collections.abc import MutableMapping
+except ImportError:
+    from collections import MutableMapping
+
+from otrs import xmlparser
+from otrs.xmlparser import Element
 
-etree.Element = _ElementType = Element
-etree.SubElement = SubElement
-etree.tostring = tostring
+# formerly the defusedxml module, patched with the builders of
+# xml.etree.ElementTree; otrs.xmlparser provides the same functions
+etree = xmlparser
 
 # Fix Python 3.x.
 try:
@@ -21,15 +29,36 @@ except NameError:
 
 
 class OTRSObject(object):
-    """Represents an object for OTRS (mappable to an XML element)."""
+    """Represents an object for OTRS (mappable to an XML element).
+
+    Values are converted once, when they are set. Subclasses can list their
+    well-known fields in FIELDS, together with `__slots__ = FIELDS`, to
+    store them in slots that are read directly; other fields are kept in a
+    dict. `attrs` offers a dict-like view on all fields.
+
+    Text values of the fields in SCHEMA are converted by the decoder of
+    their type, see DECODERS; other fields are converted by autocast().
+    """
 
     # Map : {'TagName' -> Class}
     CHILD_MAP = {}
 
+    # names of the fields stored in slots
+    FIELDS = ()
+
+    # Map : {'FieldName' -> 'int', 'datetime', 'bool' or 'str'}
+    SCHEMA = {}
+
+    __slots__ = ('childs', '_extra', '_raw', '_mask')
+
     def __init__(self, *args, **kwargs):
         """Initialize OTRS Object."""
-        self.attrs = kwargs
         self.childs = {}
+        self._extra = None      # fields that have no slot
+        self._raw = None        # original values of lossy conversions
+        self._mask = 0          # bit i is set when slot FIELDS[i] is set
+        for k, v in kwargs.items():
+            self._set(k, v)
 
     def __getattr__(self, k):
         """Get an attribute for aan OTRSObject.
@@ -39,7 +68,108 @@ class OTRSObject(object):
 
         @returns a simple type
         """
-        return autocast(self.attrs[k])
+        if k.startswith('_') or k == 'childs':
+            raise AttributeError(k)
+        if self._extra is None:
+            raise KeyError(k)
+        return self._extra[k]
+
+    def __getstate__(self):
+        """Return the state of the object, for pickle and copy."""
+        fields = dict((k, object.__getattribute__(self, k))
+                      for k in self._slot_keys())
+        return (fields, self.childs, self._extra, self._raw,
+                getattr(self, '__dict__', None))
+
+    def __setstate__(self, state):
+        """Restore the state of the object, for pickle and copy."""
+        fields, self.childs, self._extra, self._raw, extra_dict = state
+        self._mask = 0
+        index = self._field_index()
+        for k, v in fields.items():
+            object.__setattr__(self, k, v)
+            self._mask |= 1 << index[k]
+        if extra_dict:
+            self.__dict__.update(extra_dict)
+
+    @property
+    def attrs(self):
+        """Return a dict-like view on the fields of the object."""
+        return _AttrsView(self)
+
+    @attrs.setter
+    def attrs(self, attrs):
+        """Replace all fields of the object."""
+        self.attrs.clear()
+        for k, v in attrs.items():
+            self._set(k, v)
+
+    @classmethod
+    def _field_index(cls):
+        """Return a dict mapping the FIELDS of the class to their index."""
+        try:
+            return cls.__dict__['_FIELD_INDEX']
+        except KeyError:
+            cls._FIELD_INDEX = dict((k, i) for i, k in enumerate(cls.FIELDS))
+            return cls._FIELD_INDEX
+
+    @classmethod
+    def _decoders(cls):
+        """Return a dict mapping the fields of SCHEMA to their decoder."""
+        try:
+            return cls.__dict__['_DECODERS']
+        except KeyError:
+            cls._DECODERS = dict((k, DECODERS[t])
+                                 for k, t in cls.SCHEMA.items())
+            return cls._DECODERS
+
+    def _slot_keys(self):
+        """Return a generator over the names of the slots that are set."""
+        mask = self._mask
+        fields = self.FIELDS
+        while mask:
+            low = mask & -mask
+            yield fields[low.bit_length() - 1]
+            mask ^= low
+
+    def _items(self):
+        """Return a generator over the (name, value) pairs of the fields.
+
+        Values are the ones of the attrs view, except that the content of
+        an Attachment is its AttachmentContent rather than its text.
+        """
+        raw = self._raw
+        for k in self._slot_keys():
+            if raw is not None and k in raw:
+                yield k, raw[k]
+            else:
+                yield k, object.__getattribute__(self, k)
+        if self._extra is not None:
+            for k, v in list(self._extra.items()):
+                if raw is not None and k in raw:
+                    yield k, raw[k]
+                else:
+                    yield k, v
+
+    def _set(self, k, v):
+        """Convert and store the value of a field."""
+        value = v
+        if isinstance(v, (str, type(''))):
+            value = self._decoders().get(k, autocast)(v)
+            if value is not v and encode_value(value) != v:
+                if self._raw is None:
+                    self._raw = {}
+                self._raw[k] = v
+            elif self._raw is not None:
+                self._raw.pop(k, None)
+        i = self._field_index().get(k)
+        if i is not None:
+            object.__setattr__(self, k, value)
+            self._mask |= 1 << i
+        else:
+            if self._extra is None:
+                self._extra = {}
+            self._extra[k] = value
 
     @classmethod
     def from_xml(cls, xml_element):
@@ -73,6 +203,50 @@ class OTRSObject(object):
 
         return obj
 
+    def to_dict(self):
+        """Return the fields and children of the object as a dict.
+
+        Values are the ones of the attrs view, converted to text unless they
+        are numbers or None; children are lists of dicts keyed by their
+        XML_NAME. The result can be serialized as JSON.
+
+        @returns a dict
+        """
+        d = {}
+        for k, v in self._items():
+            if v is None or isinstance(v, (int, float, type(''), str)):
+                d[k] = v
+            else:
+                d[k] = encode_value(v)
+        for name, childs in self.childs.items():
+            d[name] = [c.to_dict() for c in childs]
+        return d
+
+    @classmethod
+    def from_dict(cls, d):
+        """Create an OTRS Object from the output of to_dict().
+
+        Also used for the JSON responses of REST web services, which hold
+        a single child as a dict.
+
+        @param d : a dict, lists of dicts for children in CHILD_MAP
+        @returns an OTRSObject
+        """
+        attrs = {}
+        childs = []
+        for k, v in d.items():
+            SubClass = cls.CHILD_MAP.get(k)
+            if SubClass is not None and isinstance(v, dict):
+                childs.append(SubClass.from_dict(v))
+            elif SubClass is not None and isinstance(v, list):
+                childs.extend(SubClass.from_dict(c) for c in v)
+            else:
+                attrs[k] = v
+        obj = cls(**attrs)
+        for i in childs:
+            obj.add_child(i)
+        return obj
+
     def add_child(self, childobj):
         """Add a child object to an OTRS Object.
 
@@ -115,12 +289,17 @@ class OTRSObject(object):
 
         @returns am etree.Element
         """
-        root = etree.Element(self.XML_NAME)
-        for k, v in self.attrs.items():
-            e = etree.Element(k)
+        root = Element(self.XML_NAME)
+        for k, v in self._items():
+            e = Element(k)
             if isinstance(e, str):
                 v = v.encode('utf-8')
-            if sys.version_info[0] == 3:
+            if isinstance(v, FileContent):
+                # filled in while the request is sent, see StreamedBody
+                e.text = v.placeholder
+            elif isinstance(v, (bool, datetime)):
+                e.text = encode_value(v)
+            elif sys.version_info[0] == 3:
                 e.text = str(v)
             else:
                 e.text = unicode(v)
@@ -160,16 +339,360 @@ def autocast(s):
             return s
 
 
+def decode_int(s):
+    """Return the int of a text, or the text if it is not a number."""
+    try:
+        return int(s)
+    except ValueError:
+        return s
+
+
+def decode_datetime(s):
+    """Return the datetime of an OTRS time 'YYYY-MM-DD HH:MM:SS'.
+
+    OTRS sends times in the local time of the server, the datetime is
+    naive. Texts that are not a valid time, such as
+    '0000-00-00 00:00:00', are returned as they are.
+    """
+    t = s.strip()
+    if len(t) != 19:
+        return s
+    try:
+        return datetime(int(t[0:4]), int(t[5:7]), int(t[8:10]),
+                        int(t[11:13]), int(t[14:16]), int(t[17:19]))
+    except ValueError:
+        return s
+
+
+def decode_bool(s):
+    """Return the bool of an OTRS flag ('1', 'y'...), or the text."""
+    t = s.strip().lower()
+    if t in ('1', 'y', 'yes', 'true'):
+        return True
+    if t in ('0', 'n', 'no', 'false'):
+        return False
+    return s
+
+
+def decode_text(s):
+    """Return the text as it is."""
+    return s
+
+
+# Map : {'type of SCHEMA' -> decoder}
+DECODERS = {
+    'int': decode_int,
+    'datetime': decode_datetime,
+    'bool': decode_bool,
+    'str': decode_text,
+}
+
+
+def schema(**types):
+    """Return a SCHEMA from lists of field names per type.
+
+    e.g. schema(int=('TicketID', ), datetime=('Created', ))
+    """
+    return dict((k, t) for t, fields in types.items() for k in fields)
+
+
+def encode_value(v):
+    """Return the text of a value as OTRS sends and expects it."""
+    if isinstance(v, bool):
+        return '1' if v else '0'
+    if isinstance(v, datetime):
+        return '{0:04d}-{1:02d}-{2:02d} {3:02d}:{4:02d}:{5:02d}'.format(
+            v.year, v.month, v.day, v.hour, v.minute, v.second)
+    return unicode(v)
+
+
+class AttachmentContent(object):
+    """Base64 encoded content of an attachment.
+
+    The encoded text is spooled into a temporary file, which stays in memory
+    up to SPOOL_SIZE bytes and moves to disk beyond that, and is decoded
+    chunk by chunk when read.
+    """
+
+    SPOOL_SIZE = 1024 * 1024
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, encoded):
+        """Initialize AttachmentContent.
+
+        @param encoded : the base64 encoded content, as str or bytes
+        """
+        self._file = tempfile.SpooledTemporaryFile(max_size=self.SPOOL_SIZE)
+        self._lock = threading.Lock()
+        for i in range(0, len(encoded), self.CHUNK_SIZE):
+            chunk = encoded[i:i + self.CHUNK_SIZE]
+            if not isinstance(chunk, bytes):
+                chunk = chunk.encode('ascii')
+            self._file.write(chunk)
+        self.size = len(encoded)
+
+    def encoded_chunks(self, chunk_size=CHUNK_SIZE):
+        """Return a generator over the base64 encoded content, as bytes."""
+        pos = 0
+        while True:
+            with self._lock:
+                self._file.seek(pos)
+                chunk = self._file.read(chunk_size)
+            if not chunk:
+                return
+            pos += len(chunk)
+            yield chunk
+
+    def stream(self, chunk_size=CHUNK_SIZE):
+        """Return a generator over the decoded content, as bytes."""
+        rest = b''
+        for chunk in self.encoded_chunks(chunk_size):
+            data = rest + b''.join(chunk.split())
+            cut = len(data) - len(data) % 4
+            rest = data[cut:]
+            if cut:
+                yield base64.b64decode(data[:cut])
+        if rest:
+            yield base64.b64decode(rest)
+
+    def __str__(self):
+        """Return the complete base64 encoded content."""
+        return b''.join(self.encoded_chunks()).decode('ascii')
+
+    def __reduce__(self):
+        """Pickle the content as its base64 encoded text."""
+        return (AttachmentContent, (str(self), ))
+
+
+class FileContent(AttachmentContent):
+    """Content of an attachment, read from a file while it is uploaded.
+
+    The file is base64 encoded chunk by chunk when the request is sent, so
+    uploading it takes constant memory.
+    """
+
+    def __init__(self, source):
+        """Initialize FileContent.
+
+        @param source : a path or a binary file object, read from its
+                        current position
+        """
+        self._lock = threading.Lock()
+        self.placeholder = 'otrs-attachment-{0}'.format(uuid.uuid4().hex)
+        if hasattr(source, 'read'):
+            self._path = None
+            self._fileobj = source
+            self._start = source.tell()
+            source.seek(0, os.SEEK_END)
+            self.raw_size = source.tell() - self._start
+            source.seek(self._start)
+        else:
+            self._path = source
+            self._fileobj = None
+            self.raw_size = os.path.getsize(source)
+        self.size = 4 * ((self.raw_size + 2) // 3)
+
+    def __reduce__(self):
+        """Pickle the path of the file, file objects cannot be pickled."""
+        if self._path is None:
+            raise TypeError('cannot pickle FileContent of a file object')
+        return (FileContent, (self._path, ))
+
+    def raw_chunks(self, chunk_size=AttachmentContent.CHUNK_SIZE):
+        """Return a generator over the content of the file."""
+        if self._path is not None:
+            with open(self._path, 'rb') as f:
+                for chunk in iter(lambda: f.read(chunk_size), b''):
+                    yield chunk
+            return
+        pos = self._start
+        while True:
+            with self._lock:
+                self._fileobj.seek(pos)
+                chunk = self._fileobj.read(chunk_size)
+            if not chunk:
+                return
+            pos += len(chunk)
+            yield chunk
+
+    def encoded_chunks(self, chunk_size=AttachmentContent.CHUNK_SIZE):
+        """Return a generator over the base64 encoded content, as bytes."""
+        # encode multiples of 3 bytes so the pieces concatenate cleanly
+        for chunk in self.raw_chunks(chunk_size // 4 * 3):
+            yield base64.b64encode(chunk)
+
+    def stream(self, chunk_size=AttachmentContent.CHUNK_SIZE):
+        """Return a generator over the decoded content, as bytes."""
+        return self.raw_chunks(chunk_size)
+
+
+class _ChunkReader(io.RawIOBase):
+    """Raw binary file object on top of a generator of bytes."""
+
+    def __init__(self, chunks):
+        self._chunks = chunks
+        self._buffer = b''
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        while not self._buffer:
+            try:
+                self._buffer = next(self._chunks)
+            except StopIteration:
+                return 0
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+
 class Attachment(OTRSObject):
-    """An OTRS attachment."""
+    """An OTRS attachment.
+
+    The Content is kept as an AttachmentContent; read it with stream(),
+    open() or save() to avoid holding the decoded bytes in memory.
+    """
 
     XML_NAME = 'Attachment'
 
+    def __init__(self, *args, **kwargs):
+        """Initialize Attachment."""
+        content = kwargs.get('Content')
+        if not (content is None or isinstance(content, AttachmentContent)):
+            kwargs['Content'] = AttachmentContent(content)
+        super(Attachment, self).__init__(*args, **kwargs)
+
+    @classmethod
+    def from_file(cls, source, ContentType=None, Filename=None, **kwargs):
+        """Create an Attachment streaming its content from a file.
+
+        @param source      : a path or a binary file object
+        @param ContentType : defaults to the type guessed from Filename
+        @param Filename    : defaults to the base name of the file
+        @returns an Attachment
+        """
+        if Filename is None:
+            Filename = os.path.basename(getattr(source, 'name', source))
+        if ContentType is None:
+            ContentType = (mimetypes.guess_type(Filename)[0] or
+                           'application/octet-stream')
+        return cls(Content=FileContent(source), ContentType=ContentType,
+                   Filename=Filename, **kwargs)
+
+    def __getattr__(self, k):
+        """Get an attribute, the Content is returned base64 encoded."""
+        if k == 'Content':
+            return self.attrs['Content']
+        return super(Attachment, self).__getattr__(k)
+
+    def _content(self):
+        """Return the AttachmentContent, None if there is none."""
+        if self._extra is None:
+            return None
+        return self._extra.get('Content')
+
+    def stream(self, chunk_size=AttachmentContent.CHUNK_SIZE):
+        """Return a generator over the decoded content, as bytes."""
+        content = self._content()
+        if content is None:
+            return iter([])
+        return content.stream(chunk_size)
+
+    def open(self):
+        """Return a binary file object reading the decoded content."""
+        return io.BufferedReader(_ChunkReader(self.stream()))
+
+    def save(self, fpath):
+        """Write the decoded content to a file, chunk by chunk.
+
+        @param fpath : a str, path of the file to write
+        """
+        with open(fpath, 'wb') as ffile:
+            for chunk in self.stream():
+                ffile.write(chunk)
+
 
 class DynamicField(OTRSObject):
     """An OTRS dynamic field."""
 
     XML_NAME = 'DynamicField'
+    # the type of Value depends on the field, it is left to autocast()
+    SCHEMA = schema(str=('Name', ))
+
+
+def _view_value(v):
+    """Return a stored value as the attrs view shows it."""
+    if isinstance(v, AttachmentContent):
+        return str(v)
+    return v
+
+
+class _AttrsView(MutableMapping):
+    """Dict-like view on the fields of an OTRSObject.
+
+    Values are returned as converted when they were set, unless the
+    conversion changed their text (e.g. '007' -> 7), then the original
+    value is returned. The content of an Attachment is returned as its
+    base64 encoded text, built when it is read.
+    """
+
+    __slots__ = ('_obj', )
+
+    def __init__(self, obj):
+        self._obj = obj
+
+    def __getitem__(self, k):
+        obj = self._obj
+        if obj._raw is not None and k in obj._raw:
+            return obj._raw[k]
+        i = obj._field_index().get(k)
+        if i is not None:
+            if not obj._mask >> i & 1:
+                raise KeyError(k)
+            return object.__getattribute__(obj, k)
+        if obj._extra is None:
+            raise KeyError(k)
+        return _view_value(obj._extra[k])
+
+    def __setitem__(self, k, v):
+        self._obj._set(k, v)
+
+    def __delitem__(self, k):
+        obj = self._obj
+        i = obj._field_index().get(k)
+        if i is not None:
+            if not obj._mask >> i & 1:
+                raise KeyError(k)
+            object.__delattr__(obj, k)
+            obj._mask &= ~(1 << i)
+        elif obj._extra is None or k not in obj._extra:
+            raise KeyError(k)
+        else:
+            del obj._extra[k]
+        if obj._raw is not None:
+            obj._raw.pop(k, None)
+
+    def __iter__(self):
+        obj = self._obj
+        for k in obj._slot_keys():
+            yield k
+        if obj._extra is not None:
+            for k in list(obj._extra):
+                yield k
+
+    def __len__(self):
+        obj = self._obj
+        n = bin(obj._mask).count('1')
+        return n if obj._extra is None else n + len(obj._extra)
+
+    def items(self):
+        """Return a list of the (name, value) pairs of the fields."""
+        return [(k, _view_value(v)) for k, v in self._obj._items()]
+
+    def __repr__(self):
+        return repr(dict(self.items()))
 
 
 class AttachmentContainer(object):
@@ -178,6 +701,8 @@ class AttachmentContainer(object):
     They should inherit this class in addition to OTRSObject.
     """
 
+    __slots__ = ()
+
     def attachments(self):
         """Return the dynamic fields for an object ket as a list.
 
@@ -195,12 +720,7 @@ class AttachmentContainer(object):
         """
         for a in self.attachments():
             fname = a.attrs['Filename']
-            fpath = os.path.join(folder, fname)
-            content = a.attrs['Content']
-            fcontent = base64.b64decode(content)
-            ffile = open(fpath, 'wb')
-            ffile.write(fcontent)
-            ffile.close()
+            a.save(os.path.join(folder, fname))
 
 
 class DynamicFieldContainer(object):
@@ -209,6 +729,8 @@ class DynamicFieldContainer(object):
     They should inherit this class in addition to OTRSObject.
     """
 
+    __slots__ = ()
+
     def dynamicfields(self):
         """Return the dynamic fields for an object ket as a list.
 
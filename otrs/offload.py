@@ -0,0 +1,94 @@
+"""OTRS :: offload."""
+import multiprocessing
+import threading
+
+from otrs.client import parse_response
+
+
+def offloadable(func):
+    """Mark a module level unpack function as safe to run in a worker.
+
+    The function receives the parsed response and its result is sent back
+    to the calling process, so it must be picklable, as OTRSObjects are.
+    """
+    func.offloadable = True
+    return func
+
+
+def _parse_and_unpack(data, unpack):
+    """Parse a response body and unpack it, in a worker process."""
+    return unpack(parse_response(data))
+
+
+class ParseOffload(object):
+    """Pool of processes parsing large responses.
+
+    Parsing a large TicketGet response and building its objects takes as
+    much CPU as the request takes network time, and holds the GIL meanwhile.
+    With a ParseOffload on the client, response bodies of at least
+    threshold bytes are sent to a worker process, which parses them and
+    returns the resulting objects; the calling thread waits without holding
+    the GIL. Smaller responses are parsed inline, where it is cheaper than
+    the round trip to a worker.
+
+    Only responses of operations with an offloadable unpack function are
+    offloaded: TicketGet (also TicketGet.many), TicketSearch and
+    PublicFAQGet.
+
+    The worker processes are started with the ParseOffload; create it
+    before starting threads.
+    """
+
+    def __init__(self, processes=None, threshold=256 * 1024):
+        """Initialize ParseOffload.
+
+        @param processes : the number of worker processes, defaults to the
+                           number of CPUs
+        @param threshold : the size, in bytes, from which a response body is
+                           parsed in a worker process
+        """
+        self.threshold = threshold
+        self.offloaded = 0      # responses parsed by a worker
+        self.inline = 0         # responses parsed by the calling thread
+        self._lock = threading.Lock()
+        self._pool = multiprocessing.Pool(processes)
+
+    def accepts(self, data, unpack):
+        """Return True if the response body is to be parsed by a worker.
+
+        @param data   : the response body, as bytes
+        @param unpack : the unpack function of the operation
+        """
+        offload = (len(data) >= self.threshold and
+                   getattr(unpack, 'offloadable', False))
+        with self._lock:
+            if offload:
+                self.offloaded += 1
+            else:
+                self.inline += 1
+        return offload
+
+    def run(self, data, unpack):
+        """Return unpack() of the parsed response body, run by a worker."""
+        return self._pool.apply(_parse_and_unpack, (data, unpack))
+
+    def submit(self, data, unpack, callback, error_callback):
+        """Parse and unpack a response body without waiting for the result.
+
+        One of callback(result) or error_callback(exception) is called from
+        a thread of the pool once the worker is done. Used by the
+        asynchronous client, Python 3 only.
+        """
+        self._pool.apply_async(_parse_and_unpack, (data, unpack),
+                               callback=callback,
+                               error_callback=error_callback)
+
+    def stats(self):
+        """Return the number of responses parsed by workers and inline."""
+        with self._lock:
+            return {'offloaded': self.offloaded, 'inline': self.inline}
+
+    def close(self):
+        """Stop the worker processes."""
+        self._pool.terminate()
+        self._pool.join()
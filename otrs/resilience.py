@@ -0,0 +1,238 @@
+"""OTRS :: resilience."""
+import random
+import socket
+import threading
+import time
+try:
+    import http.client as httplib
+except ImportError:
+    import httplib
+
+from otrs.client import BadStatusLineError
+from otrs.client import OTRSError
+from otrs.client import SOAPError
+
+
+class CircuitOpenError(Exception):
+    """Error raised instead of sending a request to an endpoint that is down."""
+
+    def __init__(self, endpoint, retry_at):
+        """Initialize CircuitOpenError."""
+        self.endpoint = endpoint
+        self.retry_at = retry_at
+
+    def __str__(self):
+        """Return error message for CircuitOpenError."""
+        return 'Circuit open for {0}, retrying in {1:.1f} seconds'.format(
+            self.endpoint, max(0.0, self.retry_at - time.time()))
+
+
+class CircuitBreaker(object):
+    """Failure tracking of one endpoint.
+
+    closed    : requests pass; failure_threshold consecutive transient
+                failures open the circuit
+    open      : requests fail fast with CircuitOpenError until
+                reset_timeout seconds have passed
+    half_open : up to half_open_probes requests are let through; a success
+                closes the circuit, a failure opens it again
+    """
+
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, endpoint, failure_threshold=5, reset_timeout=30,
+                 half_open_probes=1):
+        """Initialize CircuitBreaker."""
+        self.endpoint = endpoint
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = None
+        self.probes = 0
+        self.transitions = {self.OPEN: 0, self.HALF_OPEN: 0, self.CLOSED: 0}
+        self._lock = threading.Lock()
+
+    def _set_state(self, state):
+        self.state = state
+        self.transitions[state] += 1
+
+    def before(self):
+        """Raise CircuitOpenError if a request may not be sent now."""
+        with self._lock:
+            if self.state == self.OPEN:
+                retry_at = self.opened_at + self.reset_timeout
+                if time.time() < retry_at:
+                    raise CircuitOpenError(self.endpoint, retry_at)
+                self._set_state(self.HALF_OPEN)
+                self.probes = 0
+            if self.state == self.HALF_OPEN:
+                if self.probes >= self.half_open_probes:
+                    raise CircuitOpenError(self.endpoint, time.time())
+                self.probes += 1
+
+    def release(self):
+        """Give back the probe of a request interrupted before its outcome.
+
+        A half open circuit otherwise keeps rejecting requests once its
+        probe is cancelled, e.g. by KeyboardInterrupt or a cancelled task.
+        """
+        with self._lock:
+            if self.state == self.HALF_OPEN and self.probes > 0:
+                self.probes -= 1
+
+    def success(self):
+        """Record a request that reached the server."""
+        with self._lock:
+            self.failures = 0
+            if self.state != self.CLOSED:
+                self._set_state(self.CLOSED)
+
+    def failure(self):
+        """Record a transient failure."""
+        with self._lock:
+            self.failures += 1
+            if (self.state == self.HALF_OPEN or
+                    (self.state == self.CLOSED and
+                     self.failures >= self.failure_threshold)):
+                self._set_state(self.OPEN)
+                self.opened_at = time.time()
+
+
+class ResiliencePolicy(object):
+    """Retries and circuit breaking for the calls of a client.
+
+    Calls of operations marked IDEMPOTENT are retried on transient failures
+    (connection errors, dropped connections and HTTP 5xx answers) with
+    exponential backoff and full jitter. All calls go through a circuit
+    breaker per endpoint, so a server that is down is not hammered.
+    """
+
+    # HTTP status codes worth retrying
+    RETRY_STATUS = (500, 502, 503, 504)
+
+    def __init__(self, retries=3, backoff=0.5, max_backoff=30,
+                 failure_threshold=5, reset_timeout=30, half_open_probes=1,
+                 sleep=time.sleep):
+        """Initialize ResiliencePolicy.
+
+        @param retries           : maximum number of retries of a call
+        @param backoff           : base delay, in seconds
+        @param max_backoff       : maximum delay, in seconds
+        @param failure_threshold : consecutive failures opening a circuit
+        @param reset_timeout     : seconds a circuit stays open
+        @param half_open_probes  : requests let through a half open circuit
+        @param sleep             : callable used to wait between retries
+        """
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_probes = half_open_probes
+        self.sleep = sleep
+        self.retry_count = 0        # retries made
+        self.exhausted = 0          # calls that failed after all retries
+        self.rejected = 0           # calls failed fast by an open circuit
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    def breaker(self, endpoint):
+        """Return the CircuitBreaker of an endpoint."""
+        try:
+            return self._breakers[endpoint]
+        except KeyError:
+            with self._lock:
+                return self._breakers.setdefault(endpoint, CircuitBreaker(
+                    endpoint, self.failure_threshold, self.reset_timeout,
+                    self.half_open_probes))
+
+    def is_transient(self, error):
+        """Return True if a failed request may succeed when sent again."""
+        if isinstance(error, SOAPError):
+            return False
+        if isinstance(error, OTRSError):
+            return error.code in self.RETRY_STATUS
+        return isinstance(error, (BadStatusLineError, httplib.HTTPException,
+                                  socket.error))
+
+    def delay(self, attempt):
+        """Return the seconds to wait before retry number attempt (0-based)."""
+        return random.uniform(
+            0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+
+    def before(self, breaker):
+        """Raise CircuitOpenError if the breaker does not let a call pass."""
+        try:
+            breaker.before()
+        except CircuitOpenError:
+            with self._lock:
+                self.rejected += 1
+            raise
+
+    def record(self, breaker, error=None):
+        """Record the outcome of a request with the breaker of its endpoint.
+
+        Only transient failures count against the endpoint; any answer of
+        the server, even an error, shows that it is up.
+        """
+        if error is not None and self.is_transient(error):
+            breaker.failure()
+        else:
+            breaker.success()
+
+    def should_retry(self, operation, error, attempt):
+        """Record a failed attempt and return True if it is to be retried."""
+        if not self.is_transient(error):
+            return False
+        if not getattr(operation, 'IDEMPOTENT', False):
+            return False
+        with self._lock:
+            if attempt >= self.retries:
+                self.exhausted += 1
+                return False
+            self.retry_count += 1
+        return True
+
+    def call(self, operation, attempt):
+        """Run attempt() for operation, retrying transient failures.
+
+        @param operation : the OperationBase making the call
+        @param attempt   : a callable making one request
+        @returns         : the result of attempt
+        """
+        breaker = self.breaker(operation.endpoint)
+        n = 0
+        while True:
+            self.before(breaker)
+            try:
+                result = attempt()
+            except Exception as e:
+                self.record(breaker, e)
+                if not self.should_retry(operation, e, n):
+                    raise
+            except BaseException:
+                breaker.release()
+                raise
+            else:
+                self.record(breaker)
+                return result
+            self.sleep(self.delay(n))
+            n += 1
+
+    def stats(self):
+        """Return the retry counters and the circuit breaker states.
+
+        @returns a dict {'retries': ..., 'circuits': {endpoint: {...}}}
+        """
+        with self._lock:
+            breakers = list(self._breakers.values())
+            stats = {'retries': self.retry_count,
+                     'exhausted': self.exhausted,
+                     'rejected': self.rejected}
+        stats['circuits'] = dict(
+            (b.endpoint, {'state': b.state, 'failures': b.failures,
+                          'transitions': dict(b.transitions)})
+            for b in breakers)
+        return stats
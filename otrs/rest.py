@@ -0,0 +1,176 @@
+"""OTRS :: rest."""
+import json
+import re
+try:
+    from urllib.parse import quote
+    from urllib.parse import urlencode
+except ImportError:
+    from urllib import quote
+    from urllib import urlencode
+
+from otrs.client import json_list
+from otrs.client import json_variant
+from otrs.client import SOAPError
+from otrs.objects import encode_value
+from otrs.objects import OTRSObject
+from otrs.xmlparser import Element
+from otrs.xmlparser import SubElement
+
+# :Name placeholders of a route, filled with request parameters
+ROUTE_PARAM = re.compile(r':(\w+)')
+
+
+def _json_value(v):
+    """Return a request parameter as a JSON value."""
+    if isinstance(v, OTRSObject):
+        return v.to_dict()
+    if isinstance(v, (list, tuple)):
+        return [_json_value(i) for i in v]
+    if isinstance(v, bool) or not isinstance(v, (int, float, type(''), str)):
+        return encode_value(v)
+    return v
+
+
+def soap_document(doc):
+    """Return a JSON response as the etree.Element of a SOAP response.
+
+    The fields of doc become the result elements of Envelope > Body >
+    Response, objects nested elements and lists repeated elements, as the
+    unpack functions of SOAP responses expect them.
+    """
+    envelope = Element('Envelope')
+    response = SubElement(SubElement(envelope, 'Body'), 'Response')
+    for k, v in doc.items():
+        _add_elements(response, k, v)
+    return envelope
+
+
+def _add_elements(parent, name, value):
+    """Add the elements of a JSON value to parent."""
+    for v in (value if isinstance(value, list) else [value]):
+        e = SubElement(parent, name)
+        if isinstance(v, dict):
+            for k, i in v.items():
+                _add_elements(e, k, i)
+        elif v is not None:
+            e.text = encode_value(v)
+
+
+class RESTCodec(object):
+    """Wire format of the REST web services of the GenericInterface.
+
+    Requests are sent to the route of their operation, e.g. GET
+    /Ticket/:TicketID for TicketGet, with the parameters in the query
+    string for GET and as a JSON object otherwise; :Name placeholders of
+    the route are filled with the parameter of that name. Parameters a
+    query string cannot hold, such as dynamic field criteria, are sent as
+    a JSON object with the GET request, whose body OTRS reads as well. Responses are
+    JSON documents holding the same fields as the SOAP responses, and the
+    operations return the same objects.
+
+    Responses are parsed once completely read, by the calling thread: the
+    codec neither streams nor uses the ParseOffload of the client.
+    """
+
+    HEADERS = {'Content-Type': 'application/json;charset=utf-8',
+               'Accept': 'application/json'}
+
+    offloadable = False
+    streaming = False
+
+    def __init__(self, routes):
+        """Initialize RESTCodec.
+
+        @param routes : a dict {operation name: (HTTP method, route)}, as
+                        configured for the web service in OTRS, e.g.
+                        {'TicketGet': ('GET', '/Ticket/:TicketID')}
+        """
+        self.routes = dict(routes)
+
+    def request(self, operation, reqname, kwargs):
+        """Build a request, see SOAPCodec.request().
+
+        Lists of OTRSObjects (e.g. dynamic fields and attachments) become
+        arrays of objects; a DynamicField_<Name> search criterion becomes
+        an object of its own.
+        """
+        try:
+            method, route = self.routes[reqname]
+        except KeyError:
+            raise ValueError('no route for {0}'.format(reqname))
+        params = {}
+        for k, v in kwargs.items():
+            if v is None:
+                continue
+            if isinstance(v, (list, tuple)) and v and all(
+                    isinstance(i, OTRSObject) for i in v):
+                for obj in v:
+                    if obj.XML_NAME.startswith('DynamicField_'):
+                        params[obj.XML_NAME] = obj.to_dict()
+                    else:
+                        params.setdefault(obj.XML_NAME, []).append(
+                            obj.to_dict())
+            elif isinstance(v, OTRSObject):
+                params[v.XML_NAME] = v.to_dict()
+            else:
+                params[k] = _json_value(v)
+
+        def fill(match):
+            name = match.group(1)
+            if name not in params:
+                raise ValueError('{0} requires {1}, see its route {2}'.format(
+                    reqname, name, route))
+            return quote(encode_value(params.pop(name)).encode('utf-8'),
+                         safe=',')
+
+        path = ROUTE_PARAM.sub(fill, route)
+        if method != 'GET':
+            return method, path, json.dumps(params).encode('utf-8')
+        query = []
+        nested = {}
+        for k, v in sorted(params.items()):
+            values = v if isinstance(v, list) else [v]
+            if any(isinstance(i, dict) for i in values):
+                # e.g. dynamic field criteria, go in a JSON body instead
+                nested[k] = v
+                continue
+            query.extend((k, encode_value(i).encode('utf-8')) for i in values)
+        if query:
+            path += '?' + urlencode(query)
+        if nested:
+            return method, path, json.dumps(nested).encode('utf-8')
+        return method, path, None
+
+    @staticmethod
+    def parse(s):
+        """Parse a JSON response body.
+
+        @param s : the response body, as bytes
+        @returns : the decoded document, a dict
+        """
+        doc = json.loads(s.decode('utf-8'))
+        error = doc.get('Error')
+        if isinstance(error, dict):
+            raise SOAPError(error)
+        return doc
+
+    @staticmethod
+    def results(doc):
+        """Return the results of a JSON response, see OperationBase.req_iter().
+
+        @returns : the values of the fields of doc, those of a list one by
+                   one, e.g. the Ticket dicts of a TicketGet response
+        """
+        return [i for key in doc for i in json_list(doc, key)]
+
+    @staticmethod
+    def unpack(unpack, doc):
+        """Return the result of the JSON variant of unpack for doc.
+
+        An unpack function without JSON variant gets doc as the equivalent
+        SOAP response, see soap_document().
+        """
+        func = json_variant(unpack)
+        if func is None:
+            return unpack(soap_document(doc))
+        return func(doc)
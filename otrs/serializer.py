@@ -0,0 +1,167 @@
+"""OTRS :: serializer."""
+from xml.etree.ElementTree import tostring
+
+from otrs.objects import encode_value
+from otrs.objects import FileContent
+from otrs.objects import OTRSObject
+
+# Fix Python 2.x.
+try:
+    UNICODE_EXISTS = bool(type(unicode))
+except NameError:
+    unicode = lambda s: str(s)
+
+
+def escape(text):
+    """Escape the text of an element and encode it, like etree.tostring."""
+    if '&' in text:
+        text = text.replace('&', '&amp;')
+    if '<' in text:
+        text = text.replace('<', '&lt;')
+    if '>' in text:
+        text = text.replace('>', '&gt;')
+    return text.encode('ascii', 'xmlcharrefreplace')
+
+
+class SOAPSerializer(object):
+    """Serializes requests into SOAP envelopes, without building a tree.
+
+    The output is byte for byte the same as packing the etree.Element of a
+    request with OperationBase._pack_req.
+    """
+
+    def __init__(self, namespace):
+        """Initialize SOAPSerializer.
+
+        @param namespace : the namespace url of the web service
+        """
+        self.namespace = namespace
+        self.prefix = (
+            '<soapenv:Envelope '
+            'xmlns:soapenv="http://schemas.xmlsoap.org/soap/envelope/" '
+            'xmlns= "' + namespace + '"><soapenv:Header/><soapenv:Body>'
+        ).encode('utf-8')
+        self.suffix = b'</soapenv:Body></soapenv:Envelope>'
+        self._tags = {}     # tag -> (b'<tag>', b'</tag>', b'<tag />')
+
+    def _tag(self, tag):
+        try:
+            return self._tags[tag]
+        except KeyError:
+            name = tag.encode('ascii', 'xmlcharrefreplace')
+            tags = (b'<' + name + b'>', b'</' + name + b'>',
+                    b'<' + name + b' />')
+            self._tags[tag] = tags
+            return tags
+
+    def _write(self, out, tag, text):
+        start, end, empty = self._tag(tag)
+        if text:
+            out.append(start)
+            out.append(escape(text))
+            out.append(end)
+        else:
+            out.append(empty)
+
+    def _write_object(self, out, obj, files):
+        if type(obj).to_xml is not OTRSObject.to_xml:
+            # custom serialization of a subclass
+            out.append(tostring(obj.to_xml()))
+            return
+        start, end, empty = self._tag(obj.XML_NAME)
+        items = list(obj._items())
+        if not items:
+            out.append(empty)
+            return
+        out.append(start)
+        for k, v in items:
+            if isinstance(v, FileContent):
+                files.append(v)
+                text = v.placeholder
+            else:
+                text = encode_value(v)
+            self._write(out, k, text)
+        out.append(end)
+
+    def serialize(self, reqname, kwargs):
+        """Serialize a request, see OperationBase.req() for the kwargs.
+
+        @param reqname: the SOAP name of the request
+        @returns      : the request body, as bytes, or as a StreamedBody
+                        when attachments are uploaded from files
+        """
+        out = [self.prefix]
+        files = []
+        start, end, empty = self._tag(reqname)
+        out.append(start)
+        for k, v in kwargs.items():
+            if isinstance(v, OTRSObject):
+                self._write_object(out, v, files)
+            elif isinstance(v, (list, tuple)):
+                for vv in v:
+                    if isinstance(vv, OTRSObject):
+                        self._write_object(out, vv, files)
+                    else:
+                        self._write(out, k, unicode(vv))
+            else:
+                self._write(out, k, unicode(v))
+        if len(out) == 2:
+            out[1] = empty
+        else:
+            out.append(end)
+        out.append(self.suffix)
+
+        if files:
+            return StreamedBody(b''.join(out), files)
+        return b''.join(out)
+
+
+_serializers = {}
+
+
+def get_serializer(namespace):
+    """Return the SOAPSerializer of a namespace."""
+    try:
+        return _serializers[namespace]
+    except KeyError:
+        return _serializers.setdefault(namespace, SOAPSerializer(namespace))
+
+
+class StreamedBody(object):
+    """Request body streaming the content of attachments read from files.
+
+    The packed request holds a placeholder for each FileContent, which is
+    replaced by the base64 encoded file, chunk by chunk, when iterated.
+    """
+
+    def __init__(self, packed, files):
+        """Initialize StreamedBody.
+
+        @param packed : the packed request, as bytes
+        @param files  : the FileContent objects referenced in packed
+        """
+        def position(content):
+            return packed.find(content.placeholder.encode('ascii'))
+
+        self._parts = []
+        rest = packed
+        for content in sorted(files, key=position):
+            head, _, rest = rest.partition(
+                content.placeholder.encode('ascii'))
+            self._parts.append(head)
+            self._parts.append(content)
+        self._parts.append(rest)
+
+    def __len__(self):
+        """Return the length of the body, in bytes."""
+        return sum(len(p) if isinstance(p, bytes) else p.size
+                   for p in self._parts)
+
+    def __iter__(self):
+        """Return a generator over the body, as bytes."""
+        for part in self._parts:
+            if isinstance(part, bytes):
+                yield part
+            else:
+                for chunk in part.encoded_chunks():
+                    yield chunk
@@ -0,0 +1,193 @@
+"""OTRS :: session :: manager."""
+from collections import namedtuple
+import threading
+import time
+
+from otrs.client import SOAPError
+from otrs.client import WebService
+
+Session = namedtuple('Session', ('session_id', 'created'))
+
+
+class SessionManager(object):
+    """Creates, reuses and renews the session of a GenericInterfaceClient.
+
+    With a session manager, operations requiring authentication send the
+    SessionID of a session created on first use with the registered
+    credentials, instead of sending UserLogin and Password with every
+    request. A session is renewed before the OTRS SessionMaxTime or
+    SessionMaxIdleTime runs out, and when OTRS rejects it anyway, it is
+    renewed and the request is sent once more.
+
+    A client with a session manager can be shared between threads: the
+    session is read without locking and only its renewal is serialized,
+    so concurrent calls rejected with the same session renew it once.
+    """
+
+    # suffixes of the ErrorCodes OTRS answers an invalid SessionID with
+    EXPIRED_ERRORS = ('.AuthFail', '.SessionInvalid', '.InvalidSessionID')
+
+    def __init__(self, lifetime=16 * 3600, idle_timeout=2 * 3600, margin=60,
+                 customer=False):
+        """Initialize SessionManager.
+
+        @param lifetime     : the SessionMaxTime of OTRS in seconds,
+                              None to only renew rejected sessions
+        @param idle_timeout : the SessionMaxIdleTime of OTRS in seconds,
+                              None to only renew rejected sessions
+        @param margin       : seconds before expiry to renew a session at
+        @param customer     : log in as a CustomerUser instead of a User
+        """
+        self.lifetime = lifetime
+        self.idle_timeout = idle_timeout
+        self.margin = margin
+        self.customer = customer
+        self.last_used = None
+        self.renewals = 0       # sessions created after the first one
+        # the current Session, replaced as a whole; only renewals lock
+        self._session = None
+        self._lock = threading.Lock()
+
+    @property
+    def session_id(self):
+        """Return the SessionID of the current session, if any."""
+        session = self._session
+        return None if session is None else session.session_id
+
+    @property
+    def created(self):
+        """Return the creation time of the current session, if any."""
+        session = self._session
+        return None if session is None else session.created
+
+    def current(self):
+        """Return the current Session, or None."""
+        return self._session
+
+    def expiring(self, session=None, now=None):
+        """Return True when there is no session or it is about to expire.
+
+        @param session : a Session, defaults to the current one
+        """
+        if session is None:
+            session = self._session
+            if session is None:
+                return True
+        if now is None:
+            now = time.time()
+        if (self.lifetime is not None and
+                now >= session.created + self.lifetime - self.margin):
+            return True
+        if (self.idle_timeout is not None and self.last_used is not None and
+                now >= self.last_used + self.idle_timeout - self.margin):
+            return True
+        return False
+
+    def is_expired_error(self, error):
+        """Return True if a SOAPError means the session is not valid."""
+        return error.errcode.endswith(self.EXPIRED_ERRORS)
+
+    def create(self, target):
+        """Call SessionCreate with the credentials of the client of target.
+
+        @param target : the operation (or client) the session is needed for
+        @returns      : the SessionID, or an awaitable resolving to it
+        """
+        credentials = client_of(target).credentials
+        session_create = find_session_create(target)
+        if self.customer:
+            return session_create(credentials.password,
+                                  customer_user_login=credentials.login)
+        return session_create(credentials.password,
+                              user_login=credentials.login)
+
+    def store(self, session_id):
+        """Use session_id from now on and return its Session."""
+        if self._session is not None:
+            self.renewals += 1
+        session = Session(session_id, time.time())
+        self.last_used = session.created
+        self._session = session
+        return session
+
+    def touch(self):
+        """Record that the session is in use."""
+        self.last_used = time.time()
+
+    def invalidate(self):
+        """Forget the current session, the next call creates a new one."""
+        self._session = None
+
+    def needs_renewal(self, stale):
+        """Return True if the session that was stale is still current.
+
+        @param stale : the Session found expiring or rejected, or None
+        """
+        current = self._session
+        return (current is None or current is stale or
+                self.expiring(current))
+
+    def session(self, target):
+        """Return a valid Session, creating one if needed."""
+        session = self._session
+        if session is None or self.expiring(session):
+            return self.renew(target, session)
+        self.touch()
+        return session
+
+    def renew(self, target, stale):
+        """Replace the stale Session by a new one.
+
+        Only one thread creates a session at a time; threads that waited
+        for it use the session it created.
+
+        @param stale : the Session found expiring or rejected, or None
+        @returns     : the new Session
+        """
+        with self._lock:
+            if not self.needs_renewal(stale):
+                self.touch()
+                return self._session
+            return self.store(self.create(target))
+
+    def call(self, target, func, args, kwargs):
+        """Call an authenticated operation with the SessionID.
+
+        When OTRS rejects the session, it is renewed and the call is made
+        once more.
+        """
+        client = client_of(target)
+        if client.asynchronous:
+            return client._asession_call(self, target, func, args, kwargs)
+        session = self.session(target)
+        kwargs['SessionID'] = session.session_id
+        try:
+            return func(target, *args, **kwargs)
+        except SOAPError as e:
+            if not self.is_expired_error(e):
+                raise
+        kwargs['SessionID'] = self.renew(target, session).session_id
+        return func(target, *args, **kwargs)
+
+
+def client_of(target):
+    """Return the GenericInterfaceClient of an operation."""
+    ws = getattr(target, 'wsObject', None)
+    if ws is None:
+        return target
+    return ws.clientObject
+
+
+def find_session_create(target):
+    """Return a SessionCreate operation of the client of target.
+
+    The web service of target is preferred over the other web services of
+    the client.
+    """
+    ws = getattr(target, 'wsObject', None)
+    if ws is not None and hasattr(ws, 'SessionCreate'):
+        return ws.SessionCreate
+    for value in vars(client_of(target)).values():
+        if isinstance(value, WebService) and hasattr(value, 'SessionCreate'):
+            return value.SessionCreate
+    raise AttributeError('No web service of the client has SessionCreate')
@@ -1,4 +1,5 @@
 """OTRS :: session :: operations."""
+from otrs.client import json_unpack
 from otrs.client import OperationBase
 
 
@@ -15,13 +16,22 @@ class SessionCreate(Session):
         @returns the session_id
         """
         if user_login:
-            ret = self.req('SessionCreate',
-                           UserLogin=user_login,
-                           Password=password)
+            return self._call('SessionCreate', self._unpack_session_id,
+                              UserLogin=user_login,
+                              Password=password)
         else:
-            ret = self.req('SessionCreate',
-                           CustomerUserLogin=customer_user_login,
-                           Password=password)
+            return self._call('SessionCreate', self._unpack_session_id,
+                              CustomerUserLogin=customer_user_login,
+                              Password=password)
+
+    def _register_session_id(self, doc):
+        """Register the SessionID of a JSON response with the client."""
+        self.session_id = doc['SessionID']
+        return self.session_id
+
+    @json_unpack(_register_session_id)
+    def _unpack_session_id(self, ret):
+        """Register the SessionID of a response with the client."""
         signal = self._unpack_resp_one(ret)
         session_id = signal.text
 
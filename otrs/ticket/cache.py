@@ -0,0 +1,61 @@
+"""OTRS :: ticket :: cache."""
+from otrs.cache import LRUCache
+
+
+class TicketCache(LRUCache):
+    """Cache of TicketGet results.
+
+    Tickets are keyed by TicketID, the get_articles, get_dynamic_fields
+    and get_attachments flags of the request and the identity the request
+    was authenticated with, as agents may not see the same tickets. A
+    successful TicketUpdate of a ticket drops all its entries, and the
+    result of a TicketGet sent before it is not stored. Cached Ticket
+    objects are shared between callers and should be treated as read-only.
+    """
+
+    def __init__(self, *args, **kwargs):
+        """Initialize TicketCache, see LRUCache for the parameters."""
+        super(TicketCache, self).__init__(*args, **kwargs)
+        self._generations = {}      # TicketID -> number of invalidations
+
+    @staticmethod
+    def key(ticket_id, get_articles=False, get_dynamic_fields=False,
+            get_attachments=False, identity=None):
+        """Return the cache key of a TicketGet request.
+
+        @param identity : the UserLogin, or SessionID, of the request
+        """
+        return (str(ticket_id), bool(get_articles), bool(get_dynamic_fields),
+                bool(get_attachments), identity)
+
+    def generation(self, ticket_id):
+        """Return the number of invalidations of a ticket so far.
+
+        Take it before sending the TicketGet whose result is put().
+        """
+        with self._lock:
+            return self._generations.get(str(ticket_id), 0)
+
+    def put(self, key, value, generation=None):
+        """Store value for key and return it.
+
+        @param generation : the generation() of the ticket before its
+                            TicketGet was sent, the value is not stored if
+                            the ticket was invalidated since
+        """
+        entry = self._entry(value)
+        if entry is not None:
+            with self._lock:
+                if (generation is None or
+                        generation == self._generations.get(key[0], 0)):
+                    self._store(key, value, *entry)
+        return value
+
+    def invalidate(self, ticket_id):
+        """Remove all entries of a ticket."""
+        ticket_id = str(ticket_id)
+        with self._lock:
+            self._generations[ticket_id] = \
+                self._generations.get(ticket_id, 0) + 1
+            for key in [k for k in self._entries if k[0] == ticket_id]:
+                self._remove(key)
@@ -0,0 +1,174 @@
+"""OTRS :: ticket :: export."""
+import gzip
+import json
+import multiprocessing
+import os
+
+# set in each worker process by _init_worker
+_worker = {}
+
+
+def _init_worker(client_factory, webservice):
+    """Create the client of a worker process."""
+    client = client_factory()
+    _worker['client'] = client
+    _worker['webservice'] = getattr(client, webservice)
+
+
+def _export_shard(task):
+    """Fetch the tickets of a shard and write them as gzipped JSON Lines.
+
+    @returns a (shard name, number of tickets) tuple
+    """
+    name, ticket_ids, path, batch_size, flags = task
+    tmp_path = '{0}.{1}.tmp'.format(path, os.getpid())
+    count = 0
+    with gzip.open(tmp_path, 'wb') as f:
+        tickets = _worker['webservice'].TicketGet.many(
+            ticket_ids, batch_size=batch_size, **flags)
+        for ticket_id, ticket in tickets:
+            f.write(json.dumps(ticket.to_dict(), sort_keys=True)
+                    .encode('utf-8'))
+            f.write(b'\n')
+            count += 1
+    getattr(os, 'replace', os.rename)(tmp_path, path)
+    return name, count
+
+
+class TicketExport(object):
+    """Parallel export of tickets to gzipped JSON Lines files.
+
+    The TicketIDs are split in shards of consecutive ranges of shard_size
+    IDs. Shards are exported by a pool of processes, each with a client of
+    its own, so parsing the responses runs on all cores. A shard is written
+    to a temporary file that is renamed to tickets-<first id>.jsonl.gz
+    once complete.
+
+    The shards are listed in manifest.json before the export starts; when
+    the export is run again with the same folder, it uses the shards of the
+    manifest and skips the ones already written.
+    """
+
+    MANIFEST = 'manifest.json'
+
+    def __init__(self, client_factory, folder, webservice='tc',
+                 shard_size=10000, processes=None, batch_size=100,
+                 get_articles=True, get_dynamic_fields=True,
+                 get_attachments=False):
+        """Initialize TicketExport.
+
+        @param client_factory : a picklable callable (e.g. a module level
+                                function) returning a GenericInterfaceClient
+                                with its credentials registered
+        @param folder         : the output folder, created if needed
+        @param webservice     : the attribute of the client holding the
+                                GenericTicketConnectorSOAP
+        @param shard_size     : the width of the TicketID range of a shard
+        @param processes      : the number of worker processes, defaults to
+                                the number of CPUs
+        @param batch_size     : the number of tickets per TicketGet request
+        """
+        self.client_factory = client_factory
+        self.folder = folder
+        self.webservice = webservice
+        self.shard_size = shard_size
+        self.processes = processes
+        self.batch_size = batch_size
+        self.flags = {'get_articles': get_articles,
+                      'get_dynamic_fields': get_dynamic_fields,
+                      'get_attachments': get_attachments}
+
+    @property
+    def manifest_path(self):
+        """Return the path of the manifest."""
+        return os.path.join(self.folder, self.MANIFEST)
+
+    def plan(self, ticket_ids):
+        """Split TicketIDs into shards and write the manifest.
+
+        @param ticket_ids : an iterable of TicketIDs
+        @returns          : the manifest, a dict
+        """
+        shards = {}
+        for ticket_id in ticket_ids:
+            ticket_id = int(ticket_id)
+            first = ticket_id - ticket_id % self.shard_size
+            shards.setdefault(first, []).append(ticket_id)
+        manifest = {
+            'shard_size': self.shard_size,
+            'flags': self.flags,
+            'shards': [{'file': 'tickets-{0:010d}.jsonl.gz'.format(first),
+                        'first': first,
+                        'ticket_ids': sorted(ids)}
+                       for first, ids in sorted(shards.items())]}
+        if not os.path.isdir(self.folder):
+            os.makedirs(self.folder)
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f)
+        getattr(os, 'replace', os.rename)(tmp_path, self.manifest_path)
+        return manifest
+
+    def load_manifest(self):
+        """Return the manifest of a previous run, or None."""
+        if not os.path.exists(self.manifest_path):
+            return None
+        with open(self.manifest_path) as f:
+            return json.load(f)
+
+    def run(self, ticket_ids=None, **search):
+        """Export the tickets, resuming the previous run if there is one.
+
+        @param ticket_ids : the TicketIDs to export, defaults to the result
+                            of TicketSearch.iter() with the search criteria
+        @returns          : a dict with the number of shards and tickets
+                            exported by this run and of shards skipped
+        """
+        manifest = self.load_manifest()
+        if manifest is None:
+            if ticket_ids is None:
+                client = self.client_factory()
+                ticket_ids = getattr(client, self.webservice) \
+                    .TicketSearch.iter(**search)
+            manifest = self.plan(ticket_ids)
+
+        tasks = []
+        skipped = 0
+        for shard in manifest['shards']:
+            path = os.path.join(self.folder, shard['file'])
+            if os.path.exists(path):
+                skipped += 1
+                continue
+            tasks.append((shard['file'], shard['ticket_ids'], path,
+                          self.batch_size, manifest['flags']))
+
+        result = {'shards': 0, 'tickets': 0, 'skipped': skipped}
+        if not tasks:
+            return result
+        pool = multiprocessing.Pool(
+            self.processes, initializer=_init_worker,
+            initargs=(self.client_factory, self.webservice))
+        try:
+            for name, count in pool.imap_unordered(_export_shard, tasks):
+                result['shards'] += 1
+                result['tickets'] += count
+        finally:
+            pool.terminate()
+            pool.join()
+        return result
+
+
+def read_export(folder):
+    """Return a generator over the tickets of an export, as dicts.
+
+    Use Ticket.from_dict() to turn them into Ticket objects.
+    """
+    with open(os.path.join(folder, TicketExport.MANIFEST)) as f:
+        manifest = json.load(f)
+    for shard in manifest['shards']:
+        path = os.path.join(folder, shard['file'])
+        if not os.path.exists(path):
+            continue
+        with gzip.open(path, 'rb') as f:
+            for line in f:
+                yield json.loads(line.decode('utf-8'))
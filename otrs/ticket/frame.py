@@ -0,0 +1,437 @@
+"""OTRS :: ticket :: frame."""
+from array import array
+import calendar
+from collections import Counter
+from datetime import datetime
+from datetime import timedelta
+import io
+
+from otrs import xmlparser
+from otrs.client import SOAPError
+from otrs.objects import autocast
+from otrs.objects import extract_tagname
+from otrs.ticket.objects import Ticket
+
+# 64 bit integers, also on Python 2
+try:
+    array('q')
+    INT_TYPECODE = 'q'
+except ValueError:
+    INT_TYPECODE = 'l'
+
+# missing value of the numeric columns, NaT for numpy.datetime64
+NULL = -2 ** 63
+
+EPOCH = datetime(1970, 1, 1)
+
+DYNAMIC_FIELD_PREFIX = 'DynamicField_'
+
+# types of the values of str columns, also on Python 2
+TEXT_TYPES = (str, type(u''))
+
+
+class NumberColumn(object):
+    """Column of int, datetime or bool values stored in an array.
+
+    Datetimes are stored as seconds since 1970-01-01, in the time of the
+    server as they are naive, and booleans as 1 or 0. Missing values and
+    values of another type (e.g. a time that OTRS sent as
+    '0000-00-00 00:00:00') are stored as NULL.
+    """
+
+    def __init__(self, kind, data=None):
+        """Initialize NumberColumn.
+
+        @param kind : 'int', 'datetime' or 'bool'
+        """
+        self.kind = kind
+        if data is None:
+            data = array('b' if kind == 'bool' else INT_TYPECODE)
+        self.data = data
+
+    def encode(self, value):
+        """Return the number stored for value."""
+        if self.kind == 'datetime':
+            if isinstance(value, datetime):
+                return calendar.timegm(value.timetuple())
+        elif self.kind == 'bool':
+            if isinstance(value, bool):
+                return int(value)
+        elif isinstance(value, int) and not isinstance(value, bool):
+            return value
+        return NULL
+
+    def decode(self, number):
+        """Return the value of a stored number, None when missing."""
+        if number == NULL or (self.kind == 'bool' and number < 0):
+            return None
+        if self.kind == 'datetime':
+            return EPOCH + timedelta(seconds=number)
+        if self.kind == 'bool':
+            return bool(number)
+        return number
+
+    def append(self, value):
+        """Add a value at the end of the column."""
+        number = self.encode(value)
+        if number == NULL and self.kind == 'bool':
+            number = -1
+        self.data.append(number)
+
+    def keys(self):
+        """Return the array of the stored numbers, for grouping."""
+        return self.data
+
+    def key(self, value):
+        """Return the stored number of value, for filtering.
+
+        Raises TypeError for a value of another type than the column, e.g.
+        '32' for an int column or a date for a datetime one: it would never
+        match.
+        """
+        if value is None:
+            return -1 if self.kind == 'bool' else NULL
+        number = self.encode(value)
+        if number == NULL:
+            raise TypeError('{0} column cannot hold {1!r}'.format(
+                self.kind, value))
+        return number
+
+    def take(self, rows):
+        """Return a column of the values at the given row indexes."""
+        data = self.data
+        return NumberColumn(self.kind, array(data.typecode,
+                                             [data[i] for i in rows]))
+
+    def values(self):
+        """Return the list of the values."""
+        cache = {}
+        result = []
+        for number in self.data:
+            try:
+                value = cache[number]
+            except KeyError:
+                value = cache[number] = self.decode(number)
+            result.append(value)
+        return result
+
+
+class DictColumn(object):
+    """Dictionary encoded column, for texts such as Queue or State.
+
+    Each distinct value is stored once; rows hold the index of their value
+    in an array, -1 when missing.
+    """
+
+    def __init__(self, codes=None, values=None, kind=None):
+        """Initialize DictColumn.
+
+        @param kind : 'str' for a field of Ticket.SCHEMA holding texts,
+                      None when the type of the values is not known
+        """
+        self.kind = kind
+        self.codes = array('i') if codes is None else codes
+        self.dictionary = [] if values is None else values
+        self.index = dict((v, i) for i, v in enumerate(self.dictionary))
+
+    def append(self, value):
+        """Add a value at the end of the column."""
+        if value is None:
+            self.codes.append(-1)
+            return
+        try:
+            code = self.index[value]
+        except KeyError:
+            code = self.index[value] = len(self.dictionary)
+            self.dictionary.append(value)
+        self.codes.append(code)
+
+    def decode(self, code):
+        """Return the value of a code, None when missing."""
+        return None if code < 0 else self.dictionary[code]
+
+    def keys(self):
+        """Return the array of the codes, for grouping."""
+        return self.codes
+
+    def key(self, value):
+        """Return the code of value, for filtering; None if absent.
+
+        Raises TypeError for a value other than a text in a str column.
+        """
+        if value is None:
+            return -1
+        if self.kind == 'str' and not isinstance(value, TEXT_TYPES):
+            raise TypeError('str column cannot hold {0!r}'.format(value))
+        return self.index.get(value)
+
+    def take(self, rows):
+        """Return a column of the values at the given row indexes."""
+        codes = self.codes
+        return DictColumn(array('i', [codes[i] for i in rows]),
+                          list(self.dictionary), self.kind)
+
+    def values(self):
+        """Return the list of the values."""
+        dictionary = self.dictionary
+        return [None if c < 0 else dictionary[c] for c in self.codes]
+
+
+def _new_column(name):
+    kind = Ticket.SCHEMA.get(name)
+    if kind in ('int', 'datetime', 'bool'):
+        return NumberColumn(kind)
+    return DictColumn(kind=kind)
+
+
+class TicketFrame(object):
+    """Column oriented storage of the fields of many tickets.
+
+    Numeric fields (int, datetime and bool in Ticket.SCHEMA) are stored in
+    typed arrays, other fields are dictionary encoded. Filtering and
+    grouping work on the stored numbers and codes, without building Ticket
+    objects or decoding values.
+
+    Columns are the fields of Ticket.FIELDS unless given; dynamic fields of
+    the tickets are available as DynamicField_<Name> columns. Articles are
+    not stored.
+    """
+
+    def __init__(self, tickets=(), columns=None):
+        """Initialize TicketFrame.
+
+        @param tickets : an iterable of Ticket objects
+        @param columns : the names of the fields to store
+        """
+        if columns is None:
+            columns = Ticket.FIELDS
+        self._columns = dict((name, _new_column(name)) for name in columns)
+        self._names = list(columns)
+        self._dynamic = dict((name[len(DYNAMIC_FIELD_PREFIX):], name)
+                             for name in columns
+                             if name.startswith(DYNAMIC_FIELD_PREFIX))
+        self._length = 0
+        self.extend(tickets)
+
+    @classmethod
+    def _empty(cls, names, columns, length):
+        frame = cls(columns=names)
+        frame._columns = columns
+        frame._length = length
+        return frame
+
+    def __len__(self):
+        """Return the number of tickets."""
+        return self._length
+
+    @property
+    def columns(self):
+        """Return the names of the columns."""
+        return list(self._names)
+
+    def _append_row(self, row):
+        for name in self._names:
+            self._columns[name].append(row.get(name))
+        self._length += 1
+
+    def append(self, ticket):
+        """Add a Ticket."""
+        row = {}
+        for name in self._names:
+            try:
+                row[name] = getattr(ticket, name)
+            except (AttributeError, KeyError):
+                pass
+        for df in ticket.dynamicfields():
+            name = self._dynamic.get(df.attrs.get('Name'))
+            if name is not None:
+                row[name] = df.attrs.get('Value')
+        self._append_row(row)
+
+    def extend(self, tickets):
+        """Add Ticket objects."""
+        for ticket in tickets:
+            self.append(ticket)
+
+    def extend_xml(self, source):
+        """Add the tickets of a TicketGet response without building objects.
+
+        @param source : the response body, as bytes, or a file object
+        """
+        if isinstance(source, bytes):
+            source = io.BytesIO(source)
+        decoders = Ticket._decoders()
+        # Envelope > Body > TicketGetResponse > Ticket
+        depth = 0
+        response = None
+        for event, e in xmlparser.iterparse(source,
+                                              events=('start', 'end')):
+            if event == 'start':
+                depth += 1
+                if depth == 3:
+                    response = e
+                continue
+            depth -= 1
+            if depth != 3:
+                continue
+            name = extract_tagname(e)
+            if name == 'Error':
+                raise SOAPError(e)
+            if name == 'Ticket':
+                row = {}
+                for child in e:
+                    tag = extract_tagname(child)
+                    if tag == 'DynamicField':
+                        self._xml_dynamic_field(child, row)
+                    elif tag in self._columns and child.text is not None:
+                        row[tag] = decoders.get(tag, autocast)(child.text)
+                self._append_row(row)
+            e.clear()
+            response.remove(e)
+
+    def _xml_dynamic_field(self, element, row):
+        fields = dict((extract_tagname(c), c.text) for c in element)
+        name = self._dynamic.get(fields.get('Name'))
+        if name is not None:
+            row[name] = fields.get('Value')
+
+    @classmethod
+    def from_xml(cls, source, columns=None):
+        """Return a TicketFrame of the tickets of a TicketGet response."""
+        frame = cls(columns=columns)
+        frame.extend_xml(source)
+        return frame
+
+    def column(self, name):
+        """Return the list of the values of a column, None when missing."""
+        return self._columns[name].values()
+
+    def take(self, rows):
+        """Return a TicketFrame of the tickets at the given row indexes."""
+        rows = list(rows)
+        return self._empty(self._names, dict(
+            (name, c.take(rows)) for name, c in self._columns.items()),
+            len(rows))
+
+    def filter(self, **equals):
+        """Return a TicketFrame of the tickets with the given values.
+
+        e.g. filter(Queue='Support', StateType=('new', 'open')): a tuple,
+        list or set of values matches any of them. Values must have the
+        type of their column, e.g. TicketID=32 rather than '32' and a
+        datetime for Created; TypeError is raised otherwise.
+        """
+        rows = None
+        for name, wanted in equals.items():
+            column = self._columns[name]
+            if not isinstance(wanted, (tuple, list, set, frozenset)):
+                wanted = (wanted, )
+            keys = set(column.key(v) for v in wanted)
+            keys.discard(None)
+            data = column.keys()
+            if rows is None:
+                rows = [i for i, k in enumerate(data) if k in keys]
+            else:
+                rows = [i for i in rows if data[i] in keys]
+        if rows is None:
+            rows = range(self._length)
+        return self.take(rows)
+
+    def where(self, name, predicate):
+        """Return a TicketFrame of the tickets for which predicate is true.
+
+        predicate is called once per distinct value of the column, with
+        None for missing values.
+        """
+        column = self._columns[name]
+        accepted = {}
+        rows = []
+        for i, k in enumerate(column.keys()):
+            try:
+                ok = accepted[k]
+            except KeyError:
+                ok = accepted[k] = bool(predicate(column.decode(k)))
+            if ok:
+                rows.append(i)
+        return self.take(rows)
+
+    def group_count(self, *names):
+        """Return the number of tickets per value of the given columns.
+
+        @returns a dict {value: count} for one column, {(value, ...): count}
+                 for several
+        """
+        columns = [self._columns[name] for name in names]
+        if len(columns) == 1:
+            column = columns[0]
+            return dict((column.decode(k), n)
+                        for k, n in Counter(column.keys()).items())
+        counts = Counter(zip(*[c.keys() for c in columns]))
+        return dict((tuple(c.decode(k) for c, k in zip(columns, key)), n)
+                    for key, n in counts.items())
+
+    def to_dict(self, names=None):
+        """Return {name: list of values} for the columns."""
+        return dict((name, self.column(name))
+                    for name in (names or self._names))
+
+    def rows(self, names=None):
+        """Return a generator over the tickets, as dicts of their values."""
+        names = names or self._names
+        columns = [self.column(name) for name in names]
+        for values in zip(*columns):
+            yield dict(zip(names, values))
+
+    def to_numpy(self, names=None):
+        """Return {name: numpy array} for the columns; requires numpy.
+
+        int and bool columns are masked arrays, datetime columns are
+        datetime64[s] with NaT for missing values and other columns are
+        object arrays.
+        """
+        import numpy
+        result = {}
+        for name in (names or self._names):
+            column = self._columns[name]
+            if isinstance(column, DictColumn):
+                result[name] = numpy.array(column.values(), dtype=object)
+                continue
+            data = numpy.frombuffer(column.data, dtype=column.data.typecode)
+            if column.kind == 'datetime':
+                result[name] = data.astype('int64').astype('datetime64[s]')
+            elif column.kind == 'bool':
+                result[name] = numpy.ma.masked_array(data.astype(bool),
+                                                     mask=data < 0)
+            else:
+                result[name] = numpy.ma.masked_array(data.astype('int64'),
+                                                     mask=data == NULL)
+        return result
+
+    def to_pandas(self, names=None):
+        """Return a pandas DataFrame of the columns; requires pandas.
+
+        Dictionary encoded columns become categoricals, int and bool
+        columns nullable Int64 and boolean columns.
+        """
+        import numpy
+        import pandas
+        data = {}
+        names = names or self._names
+        for name in names:
+            column = self._columns[name]
+            if isinstance(column, DictColumn):
+                data[name] = pandas.Categorical.from_codes(
+                    numpy.frombuffer(column.codes, dtype='i4'),
+                    categories=column.dictionary)
+                continue
+            values = numpy.frombuffer(column.data,
+                                      dtype=column.data.typecode)
+            if column.kind == 'datetime':
+                data[name] = values.astype('int64').astype('datetime64[s]')
+            elif column.kind == 'bool':
+                data[name] = pandas.arrays.BooleanArray(values > 0,
+                                                        values < 0)
+            else:
+                data[name] = pandas.arrays.IntegerArray(
+                    values.astype('int64'), values == NULL)
+        return pandas.DataFrame(data, columns=names)
@@ -4,6 +4,7 @@ from otrs.objects import AttachmentContainer
 from otrs.objects import DynamicField
 from otrs.objects import DynamicFieldContainer
 from otrs.objects import OTRSObject
+from otrs.objects import schema
 
 
 class Article(OTRSObject, AttachmentContainer, DynamicFieldContainer):
@@ -11,6 +12,39 @@ class Article(OTRSObject, AttachmentContainer, DynamicFieldContainer):
 
     XML_NAME = 'Article'
     CHILD_MAP = {'Attachment': Attachment, 'DynamicField': DynamicField}
+    FIELDS = (
+        'Age', 'AgeTimeUnix', 'ArticleID', 'ArticleType', 'ArticleTypeID',
+        'Bcc', 'Body', 'Cc', 'CcRealname', 'ChangeBy', 'Changed', 'Charset',
+        'CommunicationChannel', 'CommunicationChannelID', 'ContentCharset',
+        'ContentType', 'CreateBy', 'CreateTimeUnix', 'Created', 'CreatedBy',
+        'CustomerID', 'CustomerUserID', 'EscalationResponseTime',
+        'EscalationSolutionTime', 'EscalationTime', 'EscalationUpdateTime',
+        'From', 'FromRealname', 'InReplyTo', 'IncomingTime',
+        'IsVisibleForCustomer', 'Lock', 'LockID', 'MessageID', 'MimeType',
+        'Owner', 'OwnerID', 'Priority', 'PriorityID', 'Queue', 'QueueID',
+        'RealTillTimeNotUsed', 'References', 'ReplyTo', 'Responsible',
+        'ResponsibleID', 'SLA', 'SLAID', 'SenderType', 'SenderTypeID',
+        'Service', 'ServiceID', 'State', 'StateID', 'StateType', 'Subject',
+        'TicketID', 'TicketNumber', 'Title', 'To', 'ToRealname', 'Type',
+        'TypeID', 'UntilTime')
+    __slots__ = FIELDS
+    SCHEMA = schema(
+        int=('Age', 'AgeTimeUnix', 'ArticleID', 'ArticleTypeID', 'ChangeBy',
+             'CommunicationChannelID', 'CreateBy', 'CreateTimeUnix',
+             'CreatedBy', 'EscalationResponseTime', 'EscalationSolutionTime',
+             'EscalationTime', 'EscalationUpdateTime', 'IncomingTime',
+             'LockID', 'OwnerID', 'PriorityID', 'QueueID',
+             'RealTillTimeNotUsed', 'ResponsibleID', 'SLAID', 'SenderTypeID',
+             'ServiceID', 'StateID', 'TicketID', 'TypeID', 'UntilTime'),
+        datetime=('Changed', 'Created'),
+        bool=('IsVisibleForCustomer', ),
+        str=('ArticleType', 'Bcc', 'Body', 'Cc', 'CcRealname', 'Charset',
+             'CommunicationChannel', 'ContentCharset', 'ContentType',
+             'CustomerID', 'CustomerUserID', 'From', 'FromRealname',
+             'InReplyTo', 'Lock', 'MessageID', 'MimeType', 'Owner',
+             'Priority', 'Queue', 'References', 'ReplyTo', 'Responsible',
+             'SLA', 'SenderType', 'Service', 'State', 'StateType', 'Subject',
+             'TicketNumber', 'Title', 'To', 'ToRealname', 'Type'))
 
 
 class Ticket(OTRSObject, DynamicFieldContainer):
@@ -18,6 +52,29 @@ class Ticket(OTRSObject, DynamicFieldContainer):
 
     XML_NAME = 'Ticket'
     CHILD_MAP = {'Article': Article, 'DynamicField': DynamicField}
+    FIELDS = (
+        'Age', 'ArchiveFlag', 'ChangeBy', 'Changed', 'CreateBy',
+        'CreateTimeUnix', 'Created', 'CustomerID', 'CustomerUserID',
+        'EscalationResponseTime', 'EscalationSolutionTime',
+        'EscalationTime', 'EscalationUpdateTime', 'GroupID', 'Lock',
+        'LockID', 'Owner', 'OwnerID', 'Priority', 'PriorityID', 'Queue',
+        'QueueID', 'RealTillTimeNotUsed', 'Responsible', 'ResponsibleID',
+        'SLA', 'SLAID', 'Service', 'ServiceID', 'State', 'StateID',
+        'StateType', 'TicketID', 'TicketNumber', 'Title', 'Type', 'TypeID',
+        'UnlockTimeout', 'UntilTime')
+    __slots__ = FIELDS
+    SCHEMA = schema(
+        int=('Age', 'ChangeBy', 'CreateBy', 'CreateTimeUnix',
+             'EscalationResponseTime', 'EscalationSolutionTime',
+             'EscalationTime', 'EscalationUpdateTime', 'GroupID', 'LockID',
+             'OwnerID', 'PriorityID', 'QueueID', 'RealTillTimeNotUsed',
+             'ResponsibleID', 'SLAID', 'ServiceID', 'StateID', 'TicketID',
+             'TypeID', 'UnlockTimeout', 'UntilTime'),
+        datetime=('Changed', 'Created'),
+        bool=('ArchiveFlag', ),
+        str=('CustomerID', 'CustomerUserID', 'Lock', 'Owner', 'Priority',
+             'Queue', 'Responsible', 'SLA', 'Service', 'State', 'StateType',
+             'TicketNumber', 'Title', 'Type'))
 
     def articles(self):
         """Return the articles for a ticket as a list.
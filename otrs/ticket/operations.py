@@ -1,12 +1,60 @@
 """OTRS :: ticket :: operations."""
+from itertools import islice
+from otrs.client import AUTH_PARAMS
 from otrs.client import authenticated
+from otrs.client import json_list
+from otrs.client import json_unpack
 from otrs.client import OperationBase
+from otrs.client import SOAPError
+from otrs.client import stream_unpack
+from otrs.client import unpack_then
 from otrs.client import WrongOperatorException
 from otrs.objects import DynamicField
+from otrs.objects import encode_value
 from otrs.objects import extract_tagname
+from otrs.offload import offloadable
 from otrs.ticket.objects import Ticket as TicketObject
 
 
+def unpack_tickets_json(doc):
+    """Return the list of Tickets of a JSON TicketGet response."""
+    return [TicketObject.from_dict(d) for d in json_list(doc, 'Ticket')]
+
+
+@json_unpack(lambda doc: unpack_tickets_json(doc)[0])
+@offloadable
+def unpack_ticket(ret):
+    """Return the Ticket of a TicketGet response."""
+    return TicketObject.from_xml(OperationBase._unpack_resp_one(ret))
+
+
+@stream_unpack(TicketObject.from_xml)
+@json_unpack(unpack_tickets_json)
+@offloadable
+def unpack_tickets(ret):
+    """Return the list of Tickets of a TicketGet response."""
+    return [TicketObject.from_xml(e)
+            for e in OperationBase._unpack_resp_several(ret)]
+
+
+@json_unpack(lambda doc: [int(i) for i in json_list(doc, 'TicketID')])
+@offloadable
+def unpack_ticket_id_list(ret):
+    """Return the list of TicketIDs of a TicketSearch response."""
+    return [int(i.text) for i in OperationBase._unpack_resp_several(ret)]
+
+
+@json_unpack(lambda doc: (int(doc['TicketID']), str(doc['TicketNumber'])))
+def unpack_ticket_ids(ret):
+    """Return the TicketID and TicketNumber of a response.
+
+    The TicketNumber is a str, as in Ticket objects: it may start with 0.
+    """
+    elements = OperationBase._unpack_resp_several(ret)
+    infos = {extract_tagname(i): i.text for i in elements}
+    return int(infos['TicketID']), infos['TicketNumber']
+
+
 class Ticket(OperationBase):
     """Base class for OTRS Ticket:: operations."""
 
@@ -39,17 +87,17 @@ class TicketCreate(Ticket):
         if not (attachments is None):
             for att in attachments:
                 att.check_fields(attachment_field_requirements)
-        ret = self.req('TicketCreate', ticket=ticket, article=article,
-                       dynamic_fields=dynamic_fields,
-                       attachments=attachments, **kwargs)
-        elements = self._unpack_resp_several(ret)
-        infos = {extract_tagname(i): int(i.text) for i in elements}
-        return infos['TicketID'], infos['TicketNumber']
+        return self._call('TicketCreate', unpack_ticket_ids,
+                          ticket=ticket, article=article,
+                          dynamic_fields=dynamic_fields,
+                          attachments=attachments, **kwargs)
 
 
 class TicketGet(Ticket):
     """Class to handle OTRS Ticket::TicketGet operation."""
 
+    IDEMPOTENT = True
+
     @authenticated
     def __call__(self, ticket_id, get_articles=False,
                  get_dynamic_fields=False,
@@ -67,21 +115,95 @@ class TicketGet(Ticket):
         will save the attachments of article[i] to the specified folder.
         """
         params = {'TicketID': str(ticket_id)}
-        params.update(kwargs)
+        params.update(self._params(get_articles, get_dynamic_fields,
+                                   get_attachments, **kwargs))
+
+        cache = self.getWebServiceObjectAttribute('cache')
+        if cache is None or set(kwargs).difference(AUTH_PARAMS):
+            return self._call('TicketGet', unpack_ticket, **params)
+
+        identity = (params.get('UserLogin') or self.credentials.login or
+                    params.get('SessionID'))
+        key = cache.key(ticket_id, get_articles, get_dynamic_fields,
+                        get_attachments, identity)
+        ticket = cache.get(key)
+        if ticket is not None:
+            return self._result(ticket)
+        generation = cache.generation(ticket_id)
+        return self._call(
+            'TicketGet',
+            unpack_then(unpack_ticket,
+                        lambda t: cache.put(key, t, generation)),
+            **params)
+
+    def many(self, ticket_ids, batch_size=100, get_articles=False,
+             get_dynamic_fields=False, get_attachments=False, **kwargs):
+        """Get several tickets, fetching up to batch_size per request.
+
+        @param ticket_ids : an iterable of TicketIDs
+        @param batch_size : the number of TicketIDs sent per request
+        @param get_articles : grab articles linked to the tickets
+        @param get_dynamic_fields : include dynamic fields in result
+        @param get_attachments : include attachments in result
+
+        @return a generator of (TicketID, `Ticket`) tuples, use
+        dict(TicketGet.many(ids)) to get the tickets keyed by TicketID.
+        Each batch is authenticated, traced and retried as a call of its
+        own. Responses are parsed while they stream in, see req_iter(), or
+        by the ParseOffload of the client when it has one. Responses of a
+        REST web service are parsed once complete.
+
+        With an asynchronous client, the batches are requested
+        concurrently and many() returns an awaitable resolving to the list
+        of (TicketID, `Ticket`) tuples, in the order of ticket_ids.
+        """
+        params = self._params(get_articles, get_dynamic_fields,
+                              get_attachments, **kwargs)
+        if self.getClientObjectAttribute('asynchronous'):
+            ticket_ids = iter(ticket_ids)
+            batches = []
+            while True:
+                batch = [str(i) for i in islice(ticket_ids, batch_size)]
+                if not batch:
+                    break
+                batches.append(self._batch(TicketID=','.join(batch),
+                                           **params))
+            return self.getClientObjectAttribute('_amany')(batches)
+        return self._many(iter(ticket_ids), batch_size, params)
+
+    def _many(self, ticket_ids, batch_size, params):
+        """Yield the (TicketID, `Ticket`) tuples of many()."""
+        while True:
+            batch = [str(i) for i in islice(ticket_ids, batch_size)]
+            if not batch:
+                return
+            for ticket in self._batch(TicketID=','.join(batch), **params):
+                yield ticket.TicketID, ticket
+
+    @authenticated
+    def _batch(self, **params):
+        """Get the tickets of one batch of many()."""
+        return self._call('TicketGet', unpack_tickets, **params)
+
+    @staticmethod
+    def _params(get_articles, get_dynamic_fields, get_attachments,
+                **kwargs):
+        """Return the request parameters for the TicketGet flags."""
+        params = dict(kwargs)
         if get_articles:
             params['AllArticles'] = True
         if get_dynamic_fields:
             params['DynamicFields'] = True
         if get_attachments:
             params['Attachments'] = True
-
-        ret = self.req('TicketGet', **params)
-        return TicketObject.from_xml(self._unpack_resp_one(ret))
+        return params
 
 
 class TicketSearch(Ticket):
     """Class to handle OTRS Ticket::TicketSearch operation."""
 
+    IDEMPOTENT = True
+
     @authenticated
     def __call__(self, dynamic_fields=None, **kwargs):
         """Search for a ticket by.
@@ -116,8 +238,148 @@ class TicketSearch(Ticket):
                 df_search_list.append(df_search)
             kwargs['DynamicFields'] = df_search_list
 
-        ret = self.req('TicketSearch', **kwargs)
-        return [int(i.text) for i in self._unpack_resp_several(ret)]
+        return self._call('TicketSearch', unpack_ticket_id_list, **kwargs)
+
+    # SortBy of iter() -> (lower bound parameter, Ticket attribute)
+    PAGING = {'Age': ('TicketCreateTimeNewerDate', 'Created'),
+              'Changed': ('TicketChangeTimeNewerDate', 'Changed')}
+
+    def iter(self, page_size=1000, sort_by='Age', dynamic_fields=None,
+             fetch=None, **kwargs):
+        """Search for tickets page by page, see __call__ for the criteria.
+
+        Tickets are searched in order of creation (sort_by 'Age') or of
+        last change (sort_by 'Changed'), at most page_size per request.
+        OTRS cannot search TicketIDs by range, so the Created (or Changed)
+        time of the last ticket of a page becomes the
+        TicketCreateTimeNewerDate (or TicketChangeTimeNewerDate) of the
+        next request. TicketIDs already returned by the previous page are
+        skipped, and when a whole page has the same time, the next page is
+        larger.
+
+        Without fetch, the last ticket of each page is fetched with an
+        extra TicketGet. With fetch, e.g. TicketGet.many, the new TicketIDs
+        of each page are passed to it and the time is taken from the
+        tickets it returns.
+
+        Memory use is bounded by the page size and the first TicketIDs are
+        available after the first request.
+
+        With an asynchronous client, iter() returns an asynchronous
+        iterator, use `async for` ; fetch then returns an awaitable.
+
+        @param page_size : the Limit of each TicketSearch request
+        @param sort_by   : 'Age' or 'Changed'
+        @param fetch     : a callable taking a list of TicketIDs and
+                           returning (TicketID, `Ticket`) tuples, the
+                           `Ticket` is None for a ticket it could not get
+        @returns         : a generator of matching TicketIDs, or of the
+                           tuples returned by fetch
+        """
+        paging = _Paging(page_size, sort_by, self.PAGING[sort_by], kwargs)
+        if self.getClientObjectAttribute('asynchronous'):
+            return self.getClientObjectAttribute('_asearch_iter')(
+                self, paging, dynamic_fields, fetch)
+        return self._iter(paging, dynamic_fields, fetch)
+
+    def _iter(self, paging, dynamic_fields, fetch):
+        """Yield the TicketIDs, or fetched tuples, of iter()."""
+        while True:
+            ticket_ids = self(dynamic_fields=dynamic_fields, **paging.params())
+            new = paging.new(ticket_ids)
+            if fetch is None:
+                results = new
+                tickets = {}
+            else:
+                results = list(fetch(new))
+                tickets = dict(results)
+            for result in results:
+                yield result
+            if paging.complete(ticket_ids):
+                return
+
+            bound = paging.bound(ticket_ids, tickets)
+            if bound is None:
+                bound = self._bound(ticket_ids, paging.bound_attr)
+            paging.advance(ticket_ids, bound)
+
+    def _bound(self, ticket_ids, bound_attr):
+        """Return the time of the last ticket of a page that can be fetched.
+
+        A ticket deleted or no longer accessible since the search is
+        skipped for the one before it.
+        """
+        ticket_get = self.getWebServiceObjectAttribute('TicketGet')
+        for ticket_id in reversed(ticket_ids):
+            try:
+                return encode_value(getattr(ticket_get(ticket_id),
+                                            bound_attr))
+            except SOAPError as e:
+                error = e
+        raise error
+
+
+class _Paging(object):
+    """Paging state of TicketSearch.iter() from one page to the next."""
+
+    def __init__(self, page_size, sort_by, paging, kwargs):
+        """Initialize _Paging.
+
+        @param paging : the (lower bound parameter, Ticket attribute) of
+                        sort_by in TicketSearch.PAGING
+        @param kwargs : the search criteria
+        """
+        self.page_size = page_size
+        self.sort_by = sort_by
+        self.bound_param, self.bound_attr = paging
+        self.kwargs = dict(kwargs)
+        self.lower = self.kwargs.pop(self.bound_param, None)
+        self.limit = page_size
+        self.seen = set()       # TicketIDs of the page(s) ending at lower
+        self.tickets = {}       # fetched `Ticket` of the TicketIDs in seen
+
+    def params(self):
+        """Return the TicketSearch parameters of the next page."""
+        params = dict(self.kwargs, SortBy=self.sort_by, OrderBy='Up',
+                      Limit=self.limit)
+        if self.lower is not None:
+            params[self.bound_param] = self.lower
+        return params
+
+    def new(self, ticket_ids):
+        """Return the TicketIDs of a page not returned by the previous."""
+        return [i for i in ticket_ids if i not in self.seen]
+
+    def complete(self, ticket_ids):
+        """Return whether the page is the last one."""
+        return len(ticket_ids) < self.limit
+
+    def bound(self, ticket_ids, tickets):
+        """Return the time of the last ticket of a page that was fetched.
+
+        @param tickets : a dict of the `Ticket` (or None) by TicketID of the
+                         new TicketIDs of the page
+        @returns       : the time, or None when no ticket of the page was
+                         fetched, by this page or the previous one
+        """
+        self.tickets.update(tickets)
+        for ticket_id in reversed(ticket_ids):
+            ticket = self.tickets.get(ticket_id)
+            if ticket is not None:
+                return encode_value(getattr(ticket, self.bound_attr))
+        return None
+
+    def advance(self, ticket_ids, bound):
+        """Move to the page after ticket_ids, whose last time is bound."""
+        if bound == self.lower:
+            # more than limit tickets with the same time
+            self.seen.update(ticket_ids)
+            self.limit *= 2
+        else:
+            self.lower = bound
+            self.seen = set(ticket_ids)
+            self.tickets = dict((i, self.tickets.get(i)) for i in ticket_ids)
+            self.limit = self.page_size
 
 
 class TicketUpdate(Ticket):
@@ -165,7 +427,14 @@ class TicketUpdate(Ticket):
             if (attachments):
                 kwargs['Attachment'] = attachments
 
-        ret = self.req('TicketUpdate', **kwargs)
-        elements = self._unpack_resp_several(ret)
-        infos = {extract_tagname(i): int(i.text) for i in elements}
-        return infos['TicketID'], infos['TicketNumber']
+        return self._call('TicketUpdate',
+                          unpack_then(unpack_ticket_ids, self._invalidate),
+                          **kwargs)
+
+    def _invalidate(self, ticket_ids):
+        """Drop an updated ticket from cache, return (TicketID, Number)."""
+        ticket_id, ticket_number = ticket_ids
+        cache = self.getWebServiceObjectAttribute('cache')
+        if cache is not None:
+            cache.invalidate(ticket_id)
+        return ticket_id, ticket_number
@@ -0,0 +1,293 @@
+"""OTRS :: ticket :: store."""
+import json
+import sqlite3
+
+from otrs.objects import DynamicField
+from otrs.objects import encode_value
+from otrs.ticket.objects import Article
+from otrs.ticket.objects import Ticket
+
+# Fix Python 2.x.
+try:
+    UNICODE_EXISTS = bool(type(unicode))
+except NameError:
+    unicode = lambda s: str(s)
+
+# fields ending in ID that do not hold numbers
+TEXT_ID_FIELDS = ('CustomerID', 'CustomerUserID', 'MessageID')
+
+
+def _column_type(field):
+    if field.endswith('ID') and field not in TEXT_ID_FIELDS:
+        return 'INTEGER'
+    return 'TEXT'
+
+
+def _columns(cls, key):
+    """Return the column definitions for the FIELDS of cls."""
+    columns = []
+    for field in cls.FIELDS:
+        definition = '"{0}" {1}'.format(field, _column_type(field))
+        if field == key:
+            definition += ' PRIMARY KEY'
+        columns.append(definition)
+    columns.append('_extra TEXT')
+    return ', '.join(columns)
+
+
+class TicketStore(object):
+    """Local SQLite replica of tickets fetched with TicketGet.
+
+    Tickets and articles get a column per field of Ticket.FIELDS and
+    Article.FIELDS, other fields are kept as JSON; dynamic fields of
+    tickets and articles are rows of their own. Attachments are not
+    stored. Queries return Ticket objects, as TicketGet does.
+    """
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS tickets ({0})'.format(
+            _columns(Ticket, 'TicketID')),
+        'CREATE TABLE IF NOT EXISTS articles ({0})'.format(
+            _columns(Article, 'ArticleID')),
+        'CREATE TABLE IF NOT EXISTS dynamic_fields ('
+        'ticket_id INTEGER NOT NULL, article_id INTEGER, '
+        'name TEXT NOT NULL, value TEXT, _extra TEXT)',
+        'CREATE INDEX IF NOT EXISTS tickets_number ON tickets (TicketNumber)',
+        'CREATE INDEX IF NOT EXISTS tickets_queue ON tickets (QueueID)',
+        'CREATE INDEX IF NOT EXISTS tickets_state_type '
+        'ON tickets (StateType)',
+        'CREATE INDEX IF NOT EXISTS tickets_changed ON tickets (Changed)',
+        'CREATE INDEX IF NOT EXISTS articles_ticket ON articles (TicketID)',
+        'CREATE INDEX IF NOT EXISTS dynamic_fields_ticket '
+        'ON dynamic_fields (ticket_id)',
+        'CREATE INDEX IF NOT EXISTS dynamic_fields_name '
+        'ON dynamic_fields (name, value)',
+    )
+
+    def __init__(self, path=':memory:'):
+        """Initialize TicketStore.
+
+        @param path : the SQLite database file, created if needed
+        """
+        self.path = path
+        self.db = sqlite3.connect(path)
+        with self.db:
+            for statement in self.SCHEMA:
+                self.db.execute(statement)
+
+    def close(self):
+        """Close the database."""
+        self.db.close()
+
+    @staticmethod
+    def _row(obj):
+        """Return the column values of obj and the JSON of other fields.
+
+        Fields without a column and empty fields (None) go to the JSON.
+        """
+        values = dict((k, None) for k in obj.FIELDS)
+        extra = {}
+        for k, v in obj.attrs.items():
+            if v is None:
+                # keep empty fields apart from absent ones
+                extra[k] = v
+            elif k in values:
+                values[k] = encode_value(v)
+            else:
+                extra[k] = encode_value(v)
+        row = [values[k] for k in obj.FIELDS]
+        row.append(json.dumps(extra) if extra else None)
+        return row
+
+    @staticmethod
+    def _insert(table, cls):
+        return 'INSERT OR REPLACE INTO {0} VALUES ({1})'.format(
+            table, ', '.join('?' * (len(cls.FIELDS) + 1)))
+
+    def upsert(self, tickets):
+        """Insert or replace tickets, in one transaction.
+
+        Articles and dynamic fields of a ticket are replaced when the
+        ticket has been fetched with them, and kept otherwise.
+
+        @param tickets : an iterable of Ticket objects
+        @returns       : the number of tickets stored
+        """
+        count = 0
+        with self.db:
+            for ticket in tickets:
+                self._upsert(ticket)
+                count += 1
+        return count
+
+    def _upsert(self, ticket):
+        db = self.db
+        ticket_id = ticket.TicketID
+        db.execute(self._insert('tickets', Ticket), self._row(ticket))
+        if 'DynamicField' in ticket.childs:
+            db.execute('DELETE FROM dynamic_fields WHERE ticket_id = ? '
+                       'AND article_id IS NULL', (ticket_id, ))
+            self._insert_dynamic_fields(ticket_id, None,
+                                        ticket.dynamicfields())
+        if 'Article' in ticket.childs:
+            db.execute('DELETE FROM dynamic_fields WHERE ticket_id = ? '
+                       'AND article_id IS NOT NULL', (ticket_id, ))
+            db.execute('DELETE FROM articles WHERE TicketID = ?',
+                       (ticket_id, ))
+            for article in ticket.articles():
+                db.execute(self._insert('articles', Article),
+                           self._row(article))
+                self._insert_dynamic_fields(
+                    ticket_id, article.ArticleID, article.dynamicfields())
+
+    def _insert_dynamic_fields(self, ticket_id, article_id, dynamic_fields):
+        rows = []
+        for df in dynamic_fields:
+            attrs = dict((k, None if v is None else encode_value(v))
+                         for k, v in df.attrs.items())
+            name = attrs.pop('Name')
+            value = attrs.pop('Value', None)
+            rows.append((ticket_id, article_id, name, value,
+                         json.dumps(attrs) if attrs else None))
+        self.db.executemany('INSERT INTO dynamic_fields VALUES (?, ?, ?, ?, ?)',
+                            rows)
+
+    def delete(self, ticket_id):
+        """Remove a ticket with its articles and dynamic fields."""
+        with self.db:
+            self.db.execute('DELETE FROM dynamic_fields WHERE ticket_id = ?',
+                            (ticket_id, ))
+            self.db.execute('DELETE FROM articles WHERE TicketID = ?',
+                            (ticket_id, ))
+            self.db.execute('DELETE FROM tickets WHERE TicketID = ?',
+                            (ticket_id, ))
+
+    @staticmethod
+    def _object(cls, columns, row):
+        attrs = dict((k, v) for k, v in zip(columns, row[:-1])
+                     if v is not None)
+        if row[-1] is not None:
+            attrs.update(json.loads(row[-1]))
+        # numbers of INTEGER columns are converted like text from OTRS
+        return cls(**dict((k, unicode(v) if isinstance(v, int) else v)
+                          for k, v in attrs.items()))
+
+    def _dynamic_fields(self, ticket_ids, articles):
+        """Return {(ticket_id, article_id): [DynamicField]}."""
+        where = '' if articles else ' AND article_id IS NULL'
+        result = {}
+        for chunk in _chunks(ticket_ids):
+            rows = self.db.execute(
+                'SELECT ticket_id, article_id, name, value, _extra '
+                'FROM dynamic_fields WHERE ticket_id IN ({0}){1} '
+                'ORDER BY rowid'.format(', '.join('?' * len(chunk)), where),
+                chunk)
+            for ticket_id, article_id, name, value, extra in rows:
+                attrs = {'Name': name}
+                if value is not None:
+                    attrs['Value'] = value
+                if extra is not None:
+                    attrs.update(json.loads(extra))
+                result.setdefault((ticket_id, article_id), []).append(
+                    DynamicField(**attrs))
+        return result
+
+    def _articles(self, ticket_ids):
+        """Return {ticket_id: [Article]}."""
+        result = {}
+        for chunk in _chunks(ticket_ids):
+            rows = self.db.execute(
+                'SELECT * FROM articles WHERE TicketID IN ({0}) '
+                'ORDER BY ArticleID'.format(', '.join('?' * len(chunk))),
+                chunk)
+            for row in rows:
+                article = self._object(Article, Article.FIELDS, row)
+                result.setdefault(row[Article.FIELDS.index('TicketID')],
+                                  []).append(article)
+        return result
+
+    def query(self, where=None, params=(), order_by='TicketID', limit=None,
+              articles=False, dynamic_fields=True, changed_since=None,
+              dynamic_field=None, **equals):
+        """Return the stored tickets matching all criteria.
+
+        @param where          : an additional SQL condition on the columns
+                                of the tickets table, e.g. 'Age > ?'
+        @param params         : the parameters of where
+        @param order_by       : a column of the tickets table
+        @param limit          : maximum number of tickets
+        @param articles       : include the articles
+        @param dynamic_fields : include the dynamic fields
+        @param changed_since  : only tickets with Changed >= this time
+        @param dynamic_field  : a (Name, Value) tuple the ticket must have
+        @param equals         : required field values, e.g. QueueID=2
+        @returns              : a list of Ticket objects
+        """
+        conditions, values = _equals(equals)
+        if changed_since is not None:
+            conditions.append('Changed >= ?')
+            values.append(encode_value(changed_since))
+        if dynamic_field is not None:
+            conditions.append(
+                'TicketID IN (SELECT ticket_id FROM dynamic_fields '
+                'WHERE name = ? AND value = ? AND article_id IS NULL)')
+            values.extend(dynamic_field)
+        if where is not None:
+            conditions.append('({0})'.format(where))
+            values.extend(params)
+        if order_by not in Ticket.FIELDS:
+            raise ValueError('{0} is not a column'.format(order_by))
+        sql = 'SELECT * FROM tickets'
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY "{0}"'.format(order_by)
+        if limit is not None:
+            sql += ' LIMIT {0:d}'.format(limit)
+
+        tickets = [self._object(Ticket, Ticket.FIELDS, row)
+                   for row in self.db.execute(sql, values)]
+        ticket_ids = [t.TicketID for t in tickets]
+        dfs = {}
+        if dynamic_fields:
+            dfs = self._dynamic_fields(ticket_ids, articles)
+        ticket_articles = self._articles(ticket_ids) if articles else {}
+        for ticket in tickets:
+            for df in dfs.get((ticket.TicketID, None), ()):
+                ticket.add_child(df)
+            for article in ticket_articles.get(ticket.TicketID, ()):
+                for df in dfs.get((ticket.TicketID, article.ArticleID), ()):
+                    article.add_child(df)
+                ticket.add_child(article)
+        return tickets
+
+    def get(self, ticket_id, articles=False, dynamic_fields=True):
+        """Return a stored Ticket, or None."""
+        tickets = self.query(TicketID=ticket_id, articles=articles,
+                             dynamic_fields=dynamic_fields)
+        return tickets[0] if tickets else None
+
+    def count(self, **equals):
+        """Return the number of stored tickets with the given field values."""
+        conditions, values = _equals(equals)
+        sql = 'SELECT COUNT(*) FROM tickets'
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        return self.db.execute(sql, values).fetchone()[0]
+
+
+def _equals(equals):
+    """Return the SQL conditions and parameters for field values."""
+    conditions = []
+    values = []
+    for k, v in sorted(equals.items()):
+        if k not in Ticket.FIELDS:
+            raise ValueError('{0} is not a column'.format(k))
+        conditions.append('"{0}" = ?'.format(k))
+        values.append(v)
+    return conditions, values
+
+
+def _chunks(values, size=500):
+    """Split values in lists short enough for an SQL IN clause."""
+    values = list(values)
+    return [values[i:i + size] for i in range(0, len(values), size)]
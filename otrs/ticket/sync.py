@@ -0,0 +1,144 @@
+"""OTRS :: ticket :: sync."""
+from itertools import islice
+import json
+from multiprocessing.pool import ThreadPool
+import os
+
+from otrs.client import SOAPError
+from otrs.objects import encode_value
+
+
+class TicketSync(object):
+    """Incremental mirror of the tickets changed since the last run.
+
+    Each run searches the tickets changed since the high-water mark with
+    TicketSearch (TicketChangeTimeNewerDate, in order of change), fetches
+    them with TicketGet from a pool of threads and passes them to the
+    callback as ('add', ticket) when created since the previous run or as
+    ('update', ticket) otherwise.
+
+    The high-water mark is the OTRS Changed time up to which all tickets
+    have been passed to the callback. It is saved to the checkpoint file
+    after every batch, so an interrupted run, or one after an outage,
+    resumes from there instead of starting over. Tickets of the last batch
+    before the mark may be passed again: delivery is at least once.
+
+    A ticket OTRS answers TicketGet with an error for, e.g. because it was
+    deleted or is not accessible, is skipped: it is listed in errors and
+    passed to on_error, and the run goes on. Other errors, such as a
+    server that is down, end the run at the last checkpoint.
+
+    The client of the web service is shared by the threads of the pool,
+    give it a SessionManager (see README, Sharing a client between threads).
+    """
+
+    def __init__(self, webservice, callback, checkpoint=None, since=None,
+                 concurrency=4, batch_size=100, get_articles=False,
+                 get_dynamic_fields=False, get_attachments=False,
+                 on_error=None, **search):
+        """Initialize TicketSync.
+
+        @param webservice  : a GenericTicketConnectorSOAP attached to a client
+        @param callback    : a callable taking an event, 'add' or 'update',
+                             and a Ticket
+        @param checkpoint  : path of the JSON file keeping the high-water
+                             mark between runs
+        @param since       : Changed time to start from when there is no
+                             checkpoint yet, None to sync all tickets
+        @param concurrency : the number of concurrent TicketGet requests
+        @param batch_size  : the number of tickets between checkpoints, also
+                             the page size of the searches
+        @param on_error    : a callable taking the TicketID and the
+                             SOAPError of a skipped ticket
+        @param search      : additional TicketSearch criteria, e.g. Queues
+        """
+        self.webservice = webservice
+        self.callback = callback
+        self.checkpoint = checkpoint
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.flags = {'get_articles': get_articles,
+                      'get_dynamic_fields': get_dynamic_fields,
+                      'get_attachments': get_attachments}
+        self.search = search
+        self.on_error = on_error
+        self.errors = []        # (TicketID, SOAPError) skipped by run()
+        self.high_water = since
+        if checkpoint is not None and os.path.exists(checkpoint):
+            with open(checkpoint) as f:
+                self.high_water = json.load(f)['high_water']
+
+    def _save(self):
+        if self.checkpoint is None:
+            return
+        tmp_path = '{0}.{1}.tmp'.format(self.checkpoint, os.getpid())
+        with open(tmp_path, 'w') as f:
+            json.dump({'high_water': self.high_water}, f)
+        getattr(os, 'replace', os.rename)(tmp_path, self.checkpoint)
+
+    def _fetch(self, ticket_id):
+        """Return (ticket_id, Ticket or None, SOAPError or None)."""
+        try:
+            return ticket_id, self.webservice.TicketGet(ticket_id,
+                                                        **self.flags), None
+        except SOAPError as e:
+            return ticket_id, None, e
+
+    def _fetch_page(self, pool, ticket_ids):
+        """Fetch the new tickets of a search page, see TicketSearch.iter().
+
+        @returns the (TicketID, Ticket or None) tuples, in order
+        """
+        results = []
+        for ticket_id, ticket, error in pool.map(self._fetch, ticket_ids):
+            if error is not None:
+                self.errors.append((ticket_id, error))
+                if self.on_error is not None:
+                    self.on_error(ticket_id, error)
+            results.append((ticket_id, ticket))
+        return results
+
+    def run(self):
+        """Pass the tickets changed since the high-water mark to callback.
+
+        @returns the number of events emitted
+        """
+        self.errors = []
+        previous = self.high_water
+        search = dict(self.search)
+        if previous is not None:
+            search['TicketChangeTimeNewerDate'] = previous
+
+        count = 0
+        pool = ThreadPool(self.concurrency)
+        try:
+            # the tickets of each page are fetched once, the search takes
+            # the time bound of the next page from them
+            results = self.webservice.TicketSearch.iter(
+                page_size=self.batch_size, sort_by='Changed',
+                fetch=lambda ticket_ids: self._fetch_page(pool, ticket_ids),
+                **search)
+            while True:
+                batch = list(islice(results, self.batch_size))
+                if not batch:
+                    break
+                tickets = [t for ticket_id, t in batch if t is not None]
+                for ticket in tickets:
+                    created = encode_value(ticket.Created)
+                    if previous is None or created > previous:
+                        self.callback('add', ticket)
+                    else:
+                        self.callback('update', ticket)
+                    count += 1
+                # tickets changed while the batch was fetched have a later
+                # Changed time, so only the earliest one is safe to resume at
+                if not tickets:
+                    continue
+                mark = min(encode_value(t.Changed) for t in tickets)
+                if self.high_water is None or mark > self.high_water:
+                    self.high_water = mark
+                    self._save()
+        finally:
+            pool.close()
+            pool.join()
+        return count
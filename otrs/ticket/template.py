@@ -1,5 +1,6 @@
 """OTRS :: ticket:: template."""
 from otrs.client import WebService
+from otrs.rest import RESTCodec
 from otrs.session.operations import SessionCreate
 from otrs.ticket.operations import TicketCreate
 from otrs.ticket.operations import TicketGet
@@ -7,12 +8,48 @@ from otrs.ticket.operations import TicketSearch
 from otrs.ticket.operations import TicketUpdate
 
 
-def GenericTicketConnectorSOAP(webservice_name='GenericTicketConnectorSOAP'):
+def GenericTicketConnectorSOAP(webservice_name='GenericTicketConnectorSOAP',
+                               cache=None):
     """Return a GenericTicketConnectorSOAP Webservice object.
 
+    @param cache : an optional otrs.ticket.cache.TicketCache for TicketGet
     @returns a WebService object with the GenericTicketConnectorSOAP operations
     """
     return WebService(webservice_name, 'http://www.otrs.org/TicketConnector',
+                      cache=cache,
+                      SessionCreate=SessionCreate(),
+                      TicketCreate=TicketCreate(),
+                      TicketGet=TicketGet(), TicketSearch=TicketSearch(),
+                      TicketUpdate=TicketUpdate())
+
+
+# routes of the operations in GenericTicketConnectorREST.yml of OTRS
+TICKET_ROUTES = {
+    'SessionCreate': ('POST', '/Session'),
+    'TicketCreate': ('POST', '/Ticket'),
+    'TicketGet': ('GET', '/Ticket/:TicketID'),
+    'TicketSearch': ('GET', '/Ticket'),
+    'TicketUpdate': ('PATCH', '/Ticket/:TicketID'),
+}
+
+
+def GenericTicketConnectorREST(webservice_name='GenericTicketConnectorREST',
+                               cache=None, routes=None):
+    """Return a GenericTicketConnectorREST Webservice object.
+
+    The operations are the ones of GenericTicketConnectorSOAP and return
+    the same objects, exchanging JSON with the server.
+
+    @param cache  : an optional otrs.ticket.cache.TicketCache for TicketGet
+    @param routes : a dict {operation name: (HTTP method, route)} replacing
+                    routes of TICKET_ROUTES, when the web service was
+                    configured differently in OTRS
+    @returns a WebService object with the GenericTicketConnectorREST
+             operations
+    """
+    return WebService(webservice_name, 'http://www.otrs.org/TicketConnector',
+                      cache=cache,
+                      codec=RESTCodec(dict(TICKET_ROUTES, **(routes or {}))),
                       SessionCreate=SessionCreate(),
                       TicketCreate=TicketCreate(),
                       TicketGet=TicketGet(), TicketSearch=TicketSearch(),
@@ -0,0 +1,469 @@
+"""OTRS :: transport."""
+import abc
+import errno
+import select
+import socket
+import sys
+import threading
+import time
+try:
+    import http.client as httplib
+    import urllib.request as urllib2
+    from urllib.parse import urlsplit
+    from urllib.request import getproxies
+    from urllib.request import proxy_bypass
+except ImportError:
+    import httplib
+    import urllib2
+    from urlparse import urlsplit
+    from urllib import getproxies
+    from urllib import proxy_bypass
+
+from otrs.metrics import clock
+
+try:
+    # the server closed the connection without sending a response
+    NO_RESPONSE_ERRORS = (httplib.RemoteDisconnected, ConnectionResetError,
+                          BrokenPipeError)
+except (AttributeError, NameError):
+    # Python 2
+    NO_RESPONSE_ERRORS = (httplib.BadStatusLine, )
+
+
+def uses_proxy(url):
+    """Return True if the environment configures a proxy for url."""
+    parts = urlsplit(url)
+    return (parts.scheme in getproxies() and
+            not proxy_bypass(parts.hostname or ''))
+
+
+def _dropped(conn):
+    """Return True if the server closed an idle connection.
+
+    An idle connection has nothing to read: a readable socket means that
+    the server closed it, or sent something it should not have.
+    """
+    sock = conn.sock
+    if sock is None:
+        return True
+    try:
+        return bool(select.select([sock], [], [], 0)[0])
+    except (ValueError, select.error):
+        return True
+
+
+def _set_timeout(conn, timeout):
+    """Apply the socket timeout of a request to a reused connection."""
+    if timeout is socket._GLOBAL_DEFAULT_TIMEOUT:
+        timeout = socket.getdefaulttimeout()
+    conn.timeout = timeout
+    conn.sock.settimeout(timeout)
+
+
+def _no_response(error):
+    """Return True if error means that no response byte was received."""
+    if isinstance(error, NO_RESPONSE_ERRORS):
+        return True
+    return (isinstance(error, socket.error) and
+            getattr(error, 'errno', None) in (errno.ECONNRESET, errno.EPIPE))
+
+
+class PoolTimeoutError(Exception):
+    """Error raised when no pooled connection became available in time."""
+
+    def __init__(self, endpoint, block_timeout):
+        """Initialize PoolTimeoutError."""
+        self.endpoint = endpoint
+        self.block_timeout = block_timeout
+
+    def __str__(self):
+        """Return error message for PoolTimeoutError."""
+        return 'No connection to {0} available within {1} seconds'.format(
+            self.endpoint, self.block_timeout)
+
+
+class Transport(object):
+    """Base class for the HTTP transports of a GenericInterfaceClient."""
+
+    __metaclass__ = abc.ABCMeta
+
+    @abc.abstractmethod
+    def request(self, url, body, headers, timeout=None, ssl_context=None,
+                method='POST', idempotent=True):
+        """POST body to url.
+
+        @param url         : the full URL of the web service endpoint
+        @param body        : the request body, as bytes, None for a GET
+        @param headers     : a dict of HTTP headers
+        @param timeout     : socket timeout in seconds
+        @param ssl_context : an ssl.SSLContext for https endpoints
+        @param method      : the HTTP method, other than POST for REST web
+                             services only
+        @param idempotent  : False when sending the request twice could
+                             apply it twice, e.g. TicketCreate
+        @returns           : a response object providing getcode() and read()
+        """
+        return
+
+    def close(self):
+        """Release all resources held by the transport."""
+        pass
+
+
+class UrllibTransport(Transport):
+    """Transport opening a new connection for every request via urlopen."""
+
+    def request(self, url, body, headers, timeout=None, ssl_context=None,
+                method='POST', idempotent=True):
+        """POST body to url through urllib2.urlopen.
+
+        Proxies of the environment (HTTP_PROXY, HTTPS_PROXY and NO_PROXY)
+        and redirects are followed by urlopen.
+        """
+        if timeout is None:
+            timeout = socket._GLOBAL_DEFAULT_TIMEOUT
+        request = urllib2.Request(url, body, headers)
+        if method != 'POST':
+            request.get_method = lambda: method
+        if ((sys.version_info[0] == 3 and sys.version_info < (3, 4, 3)) or
+                (sys.version_info < (2, 7, 9))):
+            return urllib2.urlopen(request, timeout=timeout)
+        try:
+            return urllib2.urlopen(request, context=ssl_context,
+                                   timeout=timeout)
+        except TypeError:
+            return urllib2.urlopen(request, timeout=timeout)
+
+
+class PoolStats(object):
+    """Counters of a ConnectionPool."""
+
+    def __init__(self):
+        """Initialize PoolStats."""
+        self.hits = 0               # requests served by an idle connection
+        self.new_connections = 0    # connections opened
+        self.reconnects = 0         # stale connections replaced on the fly
+        self.waits = 0              # acquisitions that had to wait
+        self.wait_time = 0.0        # total seconds spent waiting
+
+    def as_dict(self):
+        """Return the counters as a dict."""
+        return {'hits': self.hits,
+                'new_connections': self.new_connections,
+                'reconnects': self.reconnects,
+                'waits': self.waits,
+                'wait_time': self.wait_time}
+
+
+def pool_stats(pools):
+    """Return the counters of pools per endpoint, added up per endpoint.
+
+    @returns a dict {'scheme://host:port': {counter: value}}
+    """
+    stats = {}
+    for p in pools:
+        counters = stats.setdefault(p.endpoint, {})
+        for name, value in p.stats.as_dict().items():
+            counters[name] = counters.get(name, 0) + value
+    return stats
+
+
+class ConnectionPool(object):
+    """Bounded pool of persistent HTTP/1.1 connections to one endpoint.
+
+    The socket timeout is given per acquire(), so requests with different
+    timeouts can share the connections of the pool.
+    """
+
+    def __init__(self, scheme, host, port, maxsize=10, block_timeout=None,
+                 ssl_context=None):
+        """Initialize ConnectionPool.
+
+        @param maxsize       : maximum number of open connections
+        @param block_timeout : seconds to wait for a free connection when
+                               maxsize is reached, None waits forever
+        @param ssl_context   : the ssl.SSLContext of all https connections
+        """
+        self.scheme = scheme
+        self.host = host
+        self.port = port
+        self.maxsize = maxsize
+        self.block_timeout = block_timeout
+        self.ssl_context = ssl_context
+        self.stats = PoolStats()
+        self._idle = []
+        self._num_connections = 0
+        self._cond = threading.Condition(threading.Lock())
+
+    @property
+    def endpoint(self):
+        """Return scheme://host:port of the pool."""
+        return '{0}://{1}:{2}'.format(self.scheme, self.host, self.port)
+
+    def _new_connection(self, timeout):
+        """Open a new HTTP(S) connection to the endpoint."""
+        if self.scheme != 'https':
+            conn = httplib.HTTPConnection(self.host, self.port,
+                                          timeout=timeout)
+        else:
+            try:
+                conn = httplib.HTTPSConnection(self.host, self.port,
+                                               timeout=timeout,
+                                               context=self.ssl_context)
+            except TypeError:
+                conn = httplib.HTTPSConnection(self.host, self.port,
+                                               timeout=timeout)
+        conn.connect()
+        return conn
+
+    def acquire(self, timeout=None, fresh=False):
+        """Return a connection from the pool.
+
+        @param timeout : socket timeout of the connection in seconds
+        @param fresh   : never hand out an idle connection
+        @returns       : a (connection, reused) tuple
+        """
+        if timeout is None:
+            timeout = socket._GLOBAL_DEFAULT_TIMEOUT
+        started = None
+        with self._cond:
+            while True:
+                if self._idle and not fresh:
+                    self.stats.hits += 1
+                    conn = self._idle.pop()
+                    break
+                if self._num_connections < self.maxsize:
+                    self._num_connections += 1
+                    conn = None
+                    break
+                if self._idle:
+                    # recycle the slot of an idle connection
+                    self._idle.pop(0).close()
+                    conn = None
+                    break
+                now = time.time()
+                if started is None:
+                    started = now
+                    self.stats.waits += 1
+                if self.block_timeout is None:
+                    self._cond.wait()
+                else:
+                    remaining = started + self.block_timeout - now
+                    if remaining <= 0:
+                        self.stats.wait_time += now - started
+                        raise PoolTimeoutError(self.endpoint,
+                                               self.block_timeout)
+                    self._cond.wait(remaining)
+            if started is not None:
+                self.stats.wait_time += time.time() - started
+            if conn is None:
+                self.stats.new_connections += 1
+
+        if conn is not None:
+            if not _dropped(conn):
+                _set_timeout(conn, timeout)
+                return conn, True
+            # closed by the server while idle: replace it before use
+            conn.close()
+            with self._cond:
+                self.stats.reconnects += 1
+        try:
+            return self._new_connection(timeout), False
+        except Exception:
+            self._forget()
+            raise
+
+    def release(self, conn):
+        """Return a connection to the pool once its response is consumed."""
+        if conn.sock is None:
+            # the server asked to close the connection
+            self.discard(conn)
+            return
+        with self._cond:
+            self._idle.append(conn)
+            self._cond.notify()
+
+    def discard(self, conn):
+        """Close a connection and free its slot in the pool."""
+        conn.close()
+        self._forget()
+
+    def _forget(self):
+        with self._cond:
+            self._num_connections -= 1
+            self._cond.notify()
+
+    def close(self):
+        """Close all idle connections."""
+        with self._cond:
+            while self._idle:
+                self._idle.pop().close()
+                self._num_connections -= 1
+            self._cond.notify_all()
+
+
+class PooledResponse(object):
+    """HTTP response that hands its connection back to the pool when read."""
+
+    def __init__(self, response, pool, conn, connect_time=0.0):
+        """Initialize PooledResponse.
+
+        @param connect_time : seconds spent obtaining the connection
+        """
+        self._response = response
+        self._pool = pool
+        self._conn = conn
+        self.connect_time = connect_time
+
+    def getcode(self):
+        """Return the HTTP status code of the response."""
+        return self._response.status
+
+    def getheader(self, name, default=None):
+        """Return the value of a response header."""
+        return self._response.getheader(name, default)
+
+    def read(self, amt=None):
+        """Read (part of) the response body.
+
+        The connection goes back to the pool as soon as the body has been
+        read completely.
+        """
+        if amt is None:
+            data = self._response.read()
+        else:
+            data = self._response.read(amt)
+        if amt is None or not data:
+            self._release()
+        return data
+
+    def _release(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.release(conn)
+
+    def close(self):
+        """Close the response; an unread connection cannot be reused."""
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            if self._response.isclosed():
+                self._pool.release(conn)
+            else:
+                self._response.close()
+                self._pool.discard(conn)
+
+
+class PooledTransport(Transport):
+    """Transport keeping persistent HTTP/1.1 connections per endpoint.
+
+    Connections are opened to the server itself: unlike UrllibTransport,
+    it ignores the proxies of the environment and does not follow
+    redirects. GenericInterfaceClient uses an UrllibTransport by default
+    when a proxy is configured for the server.
+    """
+
+    # raised when the request could not be written to a reused connection
+    SEND_ERRORS = (httplib.CannotSendRequest, socket.error)
+
+    def __init__(self, maxsize=10, block_timeout=None):
+        """Initialize PooledTransport.
+
+        @param maxsize       : maximum number of connections per endpoint
+        @param block_timeout : seconds to wait for a free connection,
+                               None waits forever
+        """
+        self.maxsize = maxsize
+        self.block_timeout = block_timeout
+        self._pools = {}
+        self._lock = threading.Lock()
+
+    def _get_pool(self, scheme, host, port, ssl_context):
+        """Return the pool of an endpoint and SSL context."""
+        key = (scheme, host, port, ssl_context)
+        try:
+            return self._pools[key]
+        except KeyError:
+            with self._lock:
+                pool = self._pools.get(key)
+                if pool is None:
+                    pool = ConnectionPool(scheme, host, port,
+                                          maxsize=self.maxsize,
+                                          block_timeout=self.block_timeout,
+                                          ssl_context=ssl_context)
+                    self._pools[key] = pool
+        return pool
+
+    def request(self, url, body, headers, timeout=None, ssl_context=None,
+                method='POST', idempotent=True):
+        """POST body to url over a pooled connection.
+
+        A reused connection that turns out to be closed by the server is
+        replaced by a fresh one and the request is sent again, once: when
+        the request could not be written, or, for idempotent requests only,
+        when the server closed the connection without answering. Requests
+        that timed out are never sent again.
+        """
+        parts = urlsplit(url)
+        port = parts.port
+        if port is None:
+            port = 443 if parts.scheme == 'https' else 80
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        pool = self._get_pool(parts.scheme, parts.hostname, port, ssl_context)
+
+        started = clock()
+        conn, reused = pool.acquire(timeout)
+        connect_time = clock() - started
+        sent = False
+        try:
+            conn.request(method, path, body, headers)
+            sent = True
+            response = conn.getresponse()
+        except Exception as e:
+            pool.discard(conn)
+            if not (reused and self._retryable(e, sent, idempotent)):
+                raise
+            with pool._cond:
+                pool.stats.reconnects += 1
+            started = clock()
+            conn, reused = pool.acquire(timeout, fresh=True)
+            connect_time += clock() - started
+            try:
+                conn.request(method, path, body, headers)
+                response = conn.getresponse()
+            except Exception:
+                pool.discard(conn)
+                raise
+        return PooledResponse(response, pool, conn, connect_time)
+
+    def _retryable(self, error, sent, idempotent):
+        """Return True if a request failing on a reused connection is to be
+        sent again on a fresh one.
+
+        @param sent : True if the request had been written completely
+        """
+        if isinstance(error, socket.timeout):
+            return False
+        if not sent:
+            return isinstance(error, self.SEND_ERRORS)
+        return idempotent and _no_response(error)
+
+    def stats(self):
+        """Return the pool statistics, per endpoint.
+
+        The counters of the pools of an endpoint, one per SSL context, are
+        added up.
+
+        @returns a dict {'scheme://host:port': {counter: value}}
+        """
+        with self._lock:
+            pools = list(self._pools.values())
+        return pool_stats(pools)
+
+    def close(self):
+        """Close all idle connections of all pools."""
+        with self._lock:
+            pools = list(self._pools.values())
+        for p in pools:
+            p.close()
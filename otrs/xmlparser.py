@@ -0,0 +1,157 @@
+"""OTRS :: xmlparser.
+
+Parsing of the SOAP responses, with lxml when it is installed and with
+defusedxml otherwise. Both backends refuse documents with a DOCTYPE, so
+neither entity expansion (billion laughs, quadratic blowup) nor external
+entities or DTDs can be abused; SOAP messages must not contain a DTD
+anyway. Request bodies are built with xml.etree.ElementTree, whatever the
+backend: building a tree parses nothing.
+"""
+import threading
+from xml.etree.ElementTree import Element
+from xml.etree.ElementTree import ParseError as _StdlibParseError
+from xml.etree.ElementTree import SubElement
+from xml.etree.ElementTree import tostring
+
+from defusedxml import DTDForbidden
+from defusedxml import ElementTree as _defused
+try:
+    from lxml import etree as _lxml
+except ImportError:
+    _lxml = None
+
+__all__ = ('Element', 'SubElement', 'tostring', 'ParseError', 'fromstring',
+           'iterparse', 'get_backend', 'set_backend')
+
+# raised by the backends for malformed documents, the errors of lxml are
+# wrapped in it
+ParseError = _StdlibParseError
+
+
+def _parse_error(error):
+    """Return a ParseError for an lxml error, with its code and position."""
+    wrapped = ParseError(str(error))
+    wrapped.code = getattr(error, 'code', None)
+    wrapped.position = getattr(error, 'position', None)
+    return wrapped
+
+
+class DefusedXMLBackend(object):
+    """xml.etree.ElementTree parser, hardened by defusedxml."""
+
+    name = 'defusedxml'
+
+    @staticmethod
+    def fromstring(data):
+        """Parse a document and return its root element."""
+        return _defused.fromstring(data, forbid_dtd=True)
+
+    @staticmethod
+    def iterparse(source, events=('end', )):
+        """Return an iterator of (event, element) over a file object."""
+        return _defused.iterparse(source, events=events, forbid_dtd=True)
+
+
+class LxmlBackend(object):
+    """libxml2 parser of lxml, faster and leaner on large responses.
+
+    Entities are never resolved and the network never accessed; comments
+    and processing instructions are dropped, so elements only have element
+    children as with xml.etree.ElementTree.
+    """
+
+    name = 'lxml'
+
+    OPTIONS = {'resolve_entities': False, 'no_network': True,
+               'load_dtd': False, 'huge_tree': False,
+               'remove_comments': True, 'remove_pis': True}
+
+    def __init__(self):
+        """Initialize LxmlBackend."""
+        if _lxml is None:
+            raise ImportError('the lxml backend requires lxml')
+        # lxml parsers must not be shared between threads
+        self._local = threading.local()
+
+    def _parser(self):
+        parser = getattr(self._local, 'parser', None)
+        if parser is None:
+            parser = self._local.parser = _lxml.XMLParser(**self.OPTIONS)
+        return parser
+
+    @staticmethod
+    def _check(element):
+        """Raise DTDForbidden if the document of element has a DOCTYPE."""
+        docinfo = element.getroottree().docinfo
+        if docinfo.doctype or docinfo.internalDTD is not None:
+            raise DTDForbidden(docinfo.root_name, docinfo.system_url,
+                               docinfo.public_id)
+
+    def fromstring(self, data):
+        """Parse a document and return its root element."""
+        try:
+            root = _lxml.fromstring(data, self._parser())
+        except _lxml.ParseError as e:
+            raise _parse_error(e)
+        self._check(root)
+        return root
+
+    def iterparse(self, source, events=('end', )):
+        """Return an iterator of (event, element) over a file object.
+
+        The DOCTYPE is checked with the first event, before the rest of the
+        document is read.
+        """
+        checked = False
+        events = iter(_lxml.iterparse(source, events=events, **self.OPTIONS))
+        while True:
+            try:
+                event, element = next(events)
+            except StopIteration:
+                return
+            except _lxml.ParseError as e:
+                raise _parse_error(e)
+            if not checked:
+                self._check(element)
+                checked = True
+            yield event, element
+
+
+BACKENDS = {'defusedxml': DefusedXMLBackend}
+if _lxml is not None:
+    BACKENDS['lxml'] = LxmlBackend
+
+_backend = LxmlBackend() if _lxml is not None else DefusedXMLBackend()
+
+
+def get_backend():
+    """Return the parser backend in use."""
+    return _backend
+
+
+def set_backend(backend):
+    """Select the parser backend of the responses.
+
+    @param backend : 'lxml', 'defusedxml' or a backend object
+    @returns       : the previous backend
+    """
+    global _backend
+    previous = _backend
+    if not hasattr(backend, 'fromstring'):
+        try:
+            backend = BACKENDS[backend]()
+        except KeyError:
+            raise ValueError('unknown or unavailable XML backend {0}'.format(
+                backend))
+    _backend = backend
+    return previous
+
+
+def fromstring(data):
+    """Parse a document with the backend in use, see get_backend()."""
+    return _backend.fromstring(data)
+
+
+def iterparse(source, events=('end', )):
+    """Parse a file object incrementally with the backend in use."""
+    return _backend.iterparse(source, events)
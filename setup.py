@@ -19,6 +19,8 @@ setup(
     zip_safe=False,
     packages=find_packages(),
     install_requires=['defusedxml'],
+    extras_require={'lxml': ['lxml'], 'numpy': ['numpy'],
+                    'pandas': ['numpy', 'pandas']},
     include_package_data=True,
     python_requires='>=2.7, !=3.0.*, !=3.1.*, !=3.2.*, !=3.3.*, !=3.4.*, <4',
     keywords='otrs ticket support soap interface helpdesk',